@@ -0,0 +1,94 @@
+# app/artifacts.py
+import hashlib, io, os, threading, time
+from pathlib import Path
+from PIL import Image
+from app.config import OUTPUT_DIR, ARTIFACT_TTL_S
+
+HANDLE_PREFIX = "artifact://"
+
+def is_handle(value) -> bool:
+    return isinstance(value, str) and value.startswith(HANDLE_PREFIX)
+
+class ArtifactStore:
+    """
+    Content-addressed files under <root>/<sha[:2]>/<sha>.<ext>. Tools hand out
+    'artifact://<sha>.<ext>' handles instead of inlining bytes in messages.
+    Files not written or re-put for ttl_s are removed by cleanup().
+    """
+
+    def __init__(self, root: Path = OUTPUT_DIR / "artifacts", ttl_s: float = ARTIFACT_TTL_S):
+        self.root, self.ttl_s = Path(root), ttl_s
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    def _file(self, name: str) -> Path:
+        return self.root / name[:2] / name
+
+    def put(self, data: bytes, ext: str) -> str:
+        name = f"{hashlib.sha256(data).hexdigest()}.{ext.lstrip('.').lower()}"
+        path = self._file(name)
+        if path.exists():
+            os.utime(path)  # same content again: refresh its TTL
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        self._maybe_cleanup()
+        return HANDLE_PREFIX + name
+
+    def put_image(self, img: Image.Image, fmt: str = "PNG") -> str:
+        buf = io.BytesIO()
+        img.save(buf, format=fmt)
+        return self.put(buf.getvalue(), fmt.lower())
+
+    def put_file(self, path: str) -> str:
+        with open(path, "rb") as f:
+            data = f.read()
+        return self.put(data, os.path.splitext(path)[1] or "bin")
+
+    def path(self, handle: str) -> str | None:
+        """Local path behind a handle, or None if it was never stored or has expired."""
+        if not is_handle(handle):
+            return None
+        name = os.path.basename(handle[len(HANDLE_PREFIX):])  # no path traversal via handles
+        path = self._file(name)
+        return str(path) if path.exists() else None
+
+    def read_bytes(self, handle: str) -> bytes | None:
+        path = self.path(handle)
+        if path is None:
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def cleanup(self) -> int:
+        """Delete artifacts older than ttl_s; returns how many were removed."""
+        cutoff = time.time() - self.ttl_s
+        removed = 0
+        for p in self.root.glob("*/*"):
+            try:
+                if p.stat().st_mtime < cutoff:
+                    p.unlink()
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def _maybe_cleanup(self):
+        with self._lock:
+            now = time.time()
+            if now - self._last_cleanup < 600:
+                return
+            self._last_cleanup = now
+        self.cleanup()
+
+_STORE: ArtifactStore | None = None
+_STORE_LOCK = threading.Lock()
+
+def get_store() -> ArtifactStore:
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = ArtifactStore()
+        return _STORE
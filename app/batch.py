@@ -0,0 +1,156 @@
+# app/batch.py
+import asyncio, json, os, sys, time, uuid
+from typing import Iterator
+from langchain_core.messages import AIMessage, HumanMessage
+from app.checkpoint import get_checkpointer
+
+def user_message(question: str, image: str = "") -> HumanMessage:
+    """The HumanMessage main.py sends: question text, plus an image path hint for the tools."""
+    text = question + (f"\nImage path: {image}" if image else "")
+    return HumanMessage(content=[{"type": "text", "text": text}])
+
+def _read_records(path: str) -> Iterator[tuple[str, dict]]:
+    """(id, record) per non-empty line; id is the record's "id" or its 1-based line number."""
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError as e:
+                yield str(lineno), {"_error": f"invalid JSON on line {lineno}: {e}"}
+                continue
+            if not isinstance(rec, dict):
+                rec = {"_error": f"line {lineno} is not a JSON object"}
+            image = rec.get("image") or ""
+            if image and not os.path.isabs(image) and not image.startswith(("data:", "http://", "https://")):
+                beside = os.path.join(os.path.dirname(os.path.abspath(path)), image)
+                if os.path.exists(beside) and not os.path.exists(image):
+                    rec["image"] = beside  # relative paths may be relative to the JSONL file
+            yield str(rec.get("id", lineno)), rec
+
+def _finished_ids(out_path: str, retry_errors: bool) -> set[str]:
+    """Ids already in the output file (only successful ones with retry_errors); a torn last line is ignored."""
+    done: set[str] = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if rec.get("ok") or not retry_errors:
+                done.add(str(rec.get("id")))
+    return done
+
+def _open_for_append(out_path: str):
+    """
+    Open out_path for appending results. If the previous run died mid-line,
+    the torn fragment is cut off so the file stays valid JSONL; _finished_ids
+    ignored it, so that record runs again.
+    """
+    with open(out_path, "ab+") as f:
+        end = f.seek(0, os.SEEK_END)
+        f.seek(max(0, end - 1))
+        if end and f.read(1) != b"\n":
+            start = end
+            while start > 0:  # back to the start of the last line
+                step = min(start, 1 << 16)
+                f.seek(start - step)
+                i = f.read(step).rfind(b"\n")
+                start -= step
+                if i >= 0:
+                    start += i + 1
+                    break
+            f.seek(start)
+            try:
+                json.loads(f.read())
+                f.write(b"\n")  # a complete record that only lost its newline
+            except ValueError:
+                f.truncate(start)
+    return open(out_path, "a", encoding="utf-8")
+
+async def _answer(graph, system_msg, rec_id: str, rec: dict) -> dict:
+    """One record through the graph on its own thread_id; per-node times from stream_mode="updates"."""
+    out = {"id": rec_id, "question": rec.get("question", ""), "image": rec.get("image", "")}
+    if "_error" in rec or not out["question"]:
+        return {**out, "ok": False, "error": rec.get("_error", "missing 'question'"), "latency_s": 0.0}
+    thread_id = f"batch-{rec_id}-{uuid.uuid4().hex[:8]}"
+    config = {"configurable": {"thread_id": thread_id}}
+    inputs = {"messages": [system_msg, user_message(out["question"], out["image"])]}
+    nodes: dict[str, float] = {}
+    tools: list[str] = []
+    answer = ""
+    t0 = last = time.perf_counter()
+    try:
+        # Nodes run one after another, so the gap between updates is the node's duration
+        async for update in graph.astream(inputs, config, stream_mode="updates"):
+            now = time.perf_counter()
+            for node, delta in (update or {}).items():
+                nodes[node] = nodes.get(node, 0.0) + (now - last)
+                for m in (delta or {}).get("messages", []):
+                    if isinstance(m, AIMessage):
+                        tools += [tc["name"] for tc in m.tool_calls or []]
+                        if not m.tool_calls:
+                            answer = m.content if isinstance(m.content, str) else str(m.content)
+            last = now
+        out.update(ok=True, answer=answer)
+    except Exception as e:
+        out.update(ok=False, error=f"{type(e).__name__}: {e}")
+    finally:
+        await get_checkpointer().adelete_thread(thread_id)  # one-shot thread; don't grow the DB
+    out.update(latency_s=round(time.perf_counter() - t0, 4), nodes_s={k: round(v, 4) for k, v in nodes.items()},
+               tool_calls=tools)
+    return out
+
+async def arun_batch(in_path: str, out_path: str, concurrency: int = 4, retry_errors: bool = False) -> dict:
+    """
+    Answer every {question, image} record of in_path with one graph, at most
+    `concurrency` records in flight, appending one result line per record to
+    out_path as it finishes. Records whose id is already in out_path are
+    skipped, so re-running after a crash resumes where it stopped.
+    """
+    from app.graph import build_graph
+    graph, _, system_msg = build_graph()
+
+    done = _finished_ids(out_path, retry_errors)
+    stats = {"skipped": 0, "ok": 0, "failed": 0, "latencies": []}
+
+    def unfinished():
+        for rid, rec in _read_records(in_path):
+            if rid in done:
+                stats["skipped"] += 1  # input records already answered, not output lines
+            else:
+                yield rid, rec
+
+    records = unfinished()
+    f = _open_for_append(out_path)
+    t0 = time.perf_counter()
+
+    async def worker():
+        for rec_id, rec in records:  # shared generator: each record goes to exactly one worker
+            res = await _answer(graph, system_msg, rec_id, rec)
+            f.write(json.dumps(res, ensure_ascii=False) + "\n")
+            f.flush()
+            stats["ok" if res["ok"] else "failed"] += 1
+            stats["latencies"].append(res["latency_s"])
+            n = stats["ok"] + stats["failed"]
+            print(f"[batch] {n} done ({stats['failed']} failed) - {rec_id}: {res['latency_s']:.2f}s",
+                  file=sys.stderr, flush=True)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    finally:
+        f.close()
+    wall = time.perf_counter() - t0
+    lat = sorted(stats.pop("latencies"))
+    n = stats["ok"] + stats["failed"]
+    stats.update(wall_s=round(wall, 2), records_per_s=round(n / wall, 3) if wall else 0.0,
+                 p50_s=lat[len(lat) // 2] if lat else 0.0, p95_s=lat[int(0.95 * (len(lat) - 1))] if lat else 0.0)
+    return stats
+
+def run_batch(in_path: str, out_path: str, concurrency: int = 4, retry_errors: bool = False) -> dict:
+    from app.llm import run
+    return run(arun_batch(in_path, out_path, concurrency, retry_errors))
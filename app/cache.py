@@ -0,0 +1,126 @@
+# app/cache.py
+import hashlib, json, os, threading, time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable
+from app.config import CACHE_DIR, CACHE_MEM_ITEMS, CACHE_DISK_MB
+from app import telemetry
+
+def cache_key(*parts) -> str:
+    """Stable sha256 over JSON-encoded parts (tool args, content digests)."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class ResultCache:
+    """
+    Two-tier string cache: in-memory LRU + JSON files under <root>/<name>/.
+    Entries expire after ttl_s; the disk tier is trimmed oldest-first to max_disk_bytes.
+    """
+
+    def __init__(self, name: str, ttl_s: float, max_items: int = CACHE_MEM_ITEMS,
+                 max_disk_bytes: int = CACHE_DISK_MB * 1024 * 1024, root: Path = CACHE_DIR):
+        self.name, self.ttl_s = name, ttl_s
+        self.max_items, self.max_disk_bytes = max_items, max_disk_bytes
+        self.dir = Path(root) / name
+        self._mem: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes: int | None = None  # computed lazily on first write
+        self.stats = {"mem_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    def _path(self, key: str) -> Path:
+        return self.dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit and now - hit[0] < self.ttl_s:
+                self._mem.move_to_end(key)
+                self.stats["mem_hits"] += 1
+                telemetry.event("cache", cache=self.name, result="mem_hit")
+                return hit[1]
+            self._mem.pop(key, None)
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if now - entry["ts"] < self.ttl_s:
+                self._remember(key, entry["ts"], entry["value"])
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+                telemetry.event("cache", cache=self.name, result="disk_hit")
+                return entry["value"]
+            self._path(key).unlink(missing_ok=True)
+        except (OSError, ValueError, KeyError):
+            pass
+        with self._lock:
+            self.stats["misses"] += 1
+        telemetry.event("cache", cache=self.name, result="miss")
+        return None
+
+    def _remember(self, key: str, ts: float, value: str):
+        if self.max_items <= 0:
+            return
+        with self._lock:
+            self._mem[key] = (ts, value)
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_items:
+                self._mem.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def set(self, key: str, value: str):
+        ts = time.time()
+        self._remember(key, ts, value)
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps({"ts": ts, "value": value}, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, path)
+            self._account(path.stat().st_size)
+        except OSError:
+            pass  # the disk tier is best-effort; the memory tier still serves
+
+    def _account(self, added: int):
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(p.stat().st_size for p in self.dir.glob("*/*.json"))
+            else:
+                self._disk_bytes += added
+            if self._disk_bytes <= self.max_disk_bytes:
+                return
+            files = sorted(self.dir.glob("*/*.json"), key=lambda p: p.stat().st_mtime)
+            for p in files:
+                if self._disk_bytes <= self.max_disk_bytes * 0.9:  # trim with headroom
+                    break
+                size = p.stat().st_size
+                p.unlink(missing_ok=True)
+                self._disk_bytes -= size
+                self.stats["evictions"] += 1
+
+    def get_or_compute(self, key: str, fn: Callable[[], str],
+                       cacheable: Callable[[str], bool] = lambda out: True) -> str:
+        hit = self.get(key)
+        if hit is not None:
+            return hit
+        out = fn()
+        if cacheable(out):
+            self.set(key, out)
+        return out
+
+    def hit_rate(self) -> float:
+        hits = self.stats["mem_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+_CACHES: dict[str, ResultCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+def get_cache(name: str, ttl_s: float, max_disk_mb: int = CACHE_DISK_MB) -> ResultCache:
+    with _CACHES_LOCK:
+        if name not in _CACHES:
+            _CACHES[name] = ResultCache(name, ttl_s, max_disk_bytes=max_disk_mb * 1024 * 1024)
+        return _CACHES[name]
+
+def cache_stats() -> dict[str, dict]:
+    """Hit/miss/eviction counters for every cache created in this process."""
+    with _CACHES_LOCK:
+        return {name: {**c.stats, "hit_rate": round(c.hit_rate(), 4)} for name, c in _CACHES.items()}
@@ -0,0 +1,290 @@
+# app/checkpoint.py
+import os, random, sqlite3, threading, time
+from collections.abc import Iterator, Sequence
+from typing import Any
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP, BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata,
+    CheckpointTuple, get_checkpoint_id, get_checkpoint_metadata,
+)
+from app.config import CHECKPOINT_DB, CHECKPOINT_KEEP, THREAD_IDLE_TTL_S
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT, ns TEXT, checkpoint_id TEXT, parent_id TEXT,
+    type TEXT, checkpoint BLOB, meta_type TEXT, metadata BLOB,
+    PRIMARY KEY (thread_id, ns, checkpoint_id));
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT, ns TEXT, channel TEXT, version TEXT, type TEXT, value BLOB,
+    PRIMARY KEY (thread_id, ns, channel, version));
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT, ns TEXT, checkpoint_id TEXT, task_id TEXT, idx INTEGER,
+    channel TEXT, type TEXT, value BLOB, task_path TEXT,
+    PRIMARY KEY (thread_id, ns, checkpoint_id, task_id, idx));
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY, last_used REAL, turns INTEGER DEFAULT 0,
+    prompt_tokens INTEGER DEFAULT 0, last_prompt_tokens INTEGER DEFAULT 0,
+    tokens_saved INTEGER DEFAULT 0);
+"""
+
+class SqliteCheckpointer(BaseCheckpointSaver[str]):
+    """
+    LangGraph checkpointer in a local SQLite file. Only the newest `keep`
+    checkpoints per thread (and the channel blobs they reference) are kept,
+    and threads idle for longer than idle_ttl_s are deleted, so disk use stays
+    bounded however long a session runs. Also keeps per-thread prompt-token stats.
+    """
+
+    def __init__(self, path: str = str(CHECKPOINT_DB), keep: int = CHECKPOINT_KEEP,
+                 idle_ttl_s: float = THREAD_IDLE_TTL_S, *, serde=None):
+        super().__init__(serde=serde)
+        self.path, self.keep, self.idle_ttl_s = path, max(1, keep), idle_ttl_s
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        self._last_eviction = 0.0
+
+    # --- reads ---
+    def _tuple(self, thread_id: str, ns: str, row) -> CheckpointTuple:
+        checkpoint_id, parent_id, ctype, cblob, mtype, mblob = row
+        checkpoint: Checkpoint = self.serde.loads_typed((ctype, cblob))
+        values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            blob = self._conn.execute(
+                "SELECT type, value FROM blobs WHERE thread_id=? AND ns=? AND channel=? AND version=?",
+                (thread_id, ns, channel, str(version)),
+            ).fetchone()
+            if blob and blob[0] != "empty":
+                values[channel] = self.serde.loads_typed(blob)
+        writes = self._conn.execute(
+            "SELECT task_id, channel, type, value FROM writes"
+            " WHERE thread_id=? AND ns=? AND checkpoint_id=? ORDER BY task_id, idx",
+            (thread_id, ns, checkpoint_id),
+        ).fetchall()
+
+        def cfg(cid: str) -> RunnableConfig:
+            return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": cid}}
+
+        return CheckpointTuple(
+            config=cfg(checkpoint_id),
+            checkpoint={**checkpoint, "channel_values": values},
+            metadata=self.serde.loads_typed((mtype, mblob)),
+            parent_config=cfg(parent_id) if parent_id else None,
+            pending_writes=[(task, ch, self.serde.loads_typed((t, v))) for task, ch, t, v in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        cols = "checkpoint_id, parent_id, type, checkpoint, meta_type, metadata"
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._conn.execute(
+                    f"SELECT {cols} FROM checkpoints WHERE thread_id=? AND ns=? AND checkpoint_id=?",
+                    (thread_id, ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    f"SELECT {cols} FROM checkpoints WHERE thread_id=? AND ns=?"
+                    " ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, ns),
+                ).fetchone()
+            return self._tuple(thread_id, ns, row) if row else None
+
+    def list(self, config: RunnableConfig | None, *, filter: dict[str, Any] | None = None,
+             before: RunnableConfig | None = None, limit: int | None = None) -> Iterator[CheckpointTuple]:
+        where, args = [], []
+        if config:
+            where.append("thread_id=?")
+            args.append(config["configurable"]["thread_id"])
+            if (ns := config["configurable"].get("checkpoint_ns")) is not None:
+                where.append("ns=?")
+                args.append(ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id=?")
+                args.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id<?")
+            args.append(before_id)
+        sql = ("SELECT thread_id, ns, checkpoint_id, parent_id, type, checkpoint, meta_type, metadata"
+               f" FROM checkpoints {'WHERE ' + ' AND '.join(where) if where else ''}"
+               " ORDER BY checkpoint_id DESC")
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+            out = []
+            for thread_id, ns, *row in rows:
+                if limit is not None and len(out) >= limit:
+                    break
+                tup = self._tuple(thread_id, ns, row)
+                if filter and not all(tup.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                out.append(tup)
+        yield from out
+
+    # --- writes ---
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        c = checkpoint.copy()
+        values: dict[str, Any] = c.pop("channel_values")
+        blobs = [
+            (thread_id, ns, k, str(v), *(self.serde.dumps_typed(values[k]) if k in values else ("empty", b"")))
+            for k, v in new_versions.items()
+        ]
+        ctype, cblob = self.serde.dumps_typed(c)
+        mtype, mblob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                 ctype, cblob, mtype, mblob),
+            )
+            self._conn.execute(
+                "INSERT INTO threads (thread_id, last_used) VALUES (?, ?)"
+                " ON CONFLICT(thread_id) DO UPDATE SET last_used=excluded.last_used",
+                (thread_id, time.time()),
+            )
+            self._prune(thread_id, ns)
+        self._maybe_evict()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]],
+                   task_id: str, task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            rows.append((thread_id, ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+                         channel, *self.serde.dumps_typed(value), task_path))
+        # Regular writes are idempotent per (task, idx); special ones (errors, interrupts) overwrite
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                   [r for r in rows if r[4] >= 0])
+            self._conn.executemany("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                   [r for r in rows if r[4] < 0])
+
+    def _prune(self, thread_id: str, ns: str):
+        """Drop all but the newest `keep` checkpoints of a thread and blobs nothing references."""
+        keep = [r[0] for r in self._conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id=? AND ns=? ORDER BY checkpoint_id DESC",
+            (thread_id, ns),
+        )][:self.keep]
+        marks = ",".join("?" * len(keep))
+        for table in ("checkpoints", "writes"):
+            self._conn.execute(
+                f"DELETE FROM {table} WHERE thread_id=? AND ns=? AND checkpoint_id NOT IN ({marks})",
+                (thread_id, ns, *keep),
+            )
+        live = set()
+        for ctype, cblob in self._conn.execute(
+            "SELECT type, checkpoint FROM checkpoints WHERE thread_id=? AND ns=?", (thread_id, ns)
+        ):
+            live.update((ch, str(v)) for ch, v in self.serde.loads_typed((ctype, cblob))["channel_versions"].items())
+        stale = [
+            (thread_id, ns, ch, v) for ch, v in self._conn.execute(
+                "SELECT channel, version FROM blobs WHERE thread_id=? AND ns=?", (thread_id, ns)
+            ).fetchall() if (ch, v) not in live
+        ]
+        self._conn.executemany("DELETE FROM blobs WHERE thread_id=? AND ns=? AND channel=? AND version=?", stale)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock, self._conn:
+            for table in ("checkpoints", "blobs", "writes", "threads"):
+                self._conn.execute(f"DELETE FROM {table} WHERE thread_id=?", (thread_id,))
+
+    def evict_idle(self, idle_ttl_s: float | None = None) -> int:
+        """Delete threads not used for idle_ttl_s seconds; returns how many were removed."""
+        cutoff = time.time() - (self.idle_ttl_s if idle_ttl_s is None else idle_ttl_s)
+        with self._lock:
+            idle = [r[0] for r in self._conn.execute("SELECT thread_id FROM threads WHERE last_used<?", (cutoff,))]
+            for thread_id in idle:
+                self.delete_thread(thread_id)
+        return len(idle)
+
+    def _maybe_evict(self):
+        now = time.time()
+        if now - self._last_eviction > 60:
+            self._last_eviction = now
+            self.evict_idle()
+
+    # --- stats ---
+    def record_prompt(self, thread_id: str, prompt_tokens: int, tokens_saved: int):
+        """Called by agent_node for every model call with the (compacted) prompt size."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO threads (thread_id, last_used) VALUES (?, ?) ON CONFLICT(thread_id) DO NOTHING",
+                (thread_id, time.time()),
+            )
+            self._conn.execute(
+                "UPDATE threads SET turns=turns+1, prompt_tokens=prompt_tokens+?, last_prompt_tokens=?,"
+                " tokens_saved=tokens_saved+? WHERE thread_id=?",
+                (prompt_tokens, prompt_tokens, tokens_saved, thread_id),
+            )
+
+    def thread_stats(self, thread_id: str | None = None) -> "list[dict]":  # quoted: `list` is a method here
+        """
+        Per-thread: stored checkpoints and bytes on disk, LLM calls, prompt tokens
+        (total / last call) and tokens removed by history compaction.
+        """
+        sql = ("SELECT t.thread_id, t.last_used, t.turns, t.prompt_tokens, t.last_prompt_tokens, t.tokens_saved,"
+               " (SELECT COUNT(*) FROM checkpoints c WHERE c.thread_id=t.thread_id),"
+               " (SELECT COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) FROM checkpoints c"
+               "  WHERE c.thread_id=t.thread_id)"
+               " + (SELECT COALESCE(SUM(LENGTH(value)), 0) FROM blobs b WHERE b.thread_id=t.thread_id)"
+               " + (SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes w WHERE w.thread_id=t.thread_id)"
+               " FROM threads t")
+        args: tuple = ()
+        if thread_id is not None:
+            sql += " WHERE t.thread_id=?"
+            args = (thread_id,)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY t.last_used DESC", args).fetchall()
+        keys = ("thread_id", "last_used", "llm_calls", "prompt_tokens", "last_prompt_tokens",
+                "tokens_saved", "checkpoints", "stored_bytes")
+        return [dict(zip(keys, r)) for r in rows]
+
+    # --- async API (local SQLite calls are short; run them inline like InMemorySaver) ---
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return self.get_tuple(config)
+
+    async def alist(self, config: RunnableConfig | None, *, filter: dict[str, Any] | None = None,
+                    before: RunnableConfig | None = None, limit: int | None = None):
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[tuple[str, Any]],
+                          task_id: str, task_path: str = "") -> None:
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return self.delete_thread(thread_id)
+
+    def get_next_version(self, current: str | None, channel: None) -> str:
+        # Same scheme as InMemorySaver: zero-padded counter + random suffix, so versions sort as strings
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+_CHECKPOINTER: SqliteCheckpointer | None = None
+_CHECKPOINTER_LOCK = threading.Lock()
+
+def get_checkpointer() -> SqliteCheckpointer:
+    """One checkpointer (and SQLite connection) per process, shared by every graph/session."""
+    global _CHECKPOINTER
+    with _CHECKPOINTER_LOCK:
+        if _CHECKPOINTER is None:
+            _CHECKPOINTER = SqliteCheckpointer()
+        return _CHECKPOINTER
@@ -26,6 +26,7 @@ def get_secret(name: str, default: str | None = None) -> str | None:
 OPENAI_API_KEY = get_secret("OPENAI_API_KEY", "")
 TAVILY_API_KEY = get_secret("TAVILY_API_KEY", "")
 OPENAI_MODEL   = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+OPENAI_BASE_URL = get_secret("OPENAI_BASE_URL", "") or None  # any OpenAI-compatible server
 
 if not OPENAI_API_KEY:
     raise RuntimeError(
@@ -71,3 +72,140 @@ OUTPUT_DIR = Path(get_secret("OUTPUT_DIR", str(DATA_BASE / "outputs"))).resolve(
 
 for p in (DOC_DIR, INDEX_DIR, OUTPUT_DIR):
     p.mkdir(parents=True, exist_ok=True)
+
+# ----- RUNTIME TUNING -----
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(get_secret(name, str(default)))
+    except (TypeError, ValueError):
+        return default
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    return str(get_secret(name, "1" if default else "0")).strip().lower() in ("1", "true", "yes")
+
+# "1" warms the RAG index and tool models in a background thread (for servers)
+WARMUP = _env_flag("WARMUP")
+
+# RapidOCR engine pool: engines are created lazily up to OCR_POOL_SIZE and reused.
+# ONNX Runtime threads are set explicitly so N pooled engines don't oversubscribe the CPU.
+OCR_POOL_SIZE         = max(1, _env_int("OCR_POOL_SIZE", 2))
+OCR_INTRA_OP_THREADS  = max(1, _env_int("OCR_INTRA_OP_THREADS", max(1, (os.cpu_count() or 1) // OCR_POOL_SIZE)))
+OCR_INTER_OP_THREADS  = max(1, _env_int("OCR_INTER_OP_THREADS", 1))
+# Images are decoded once per source (IMAGE_CACHE_MB LRU of encoded bytes + decoded copies) and
+# downscaled to what each model uses: OCR_MAX_SIDE (RapidOCR's max_side_len), DETR's processor size.
+OCR_MAX_SIDE          = max(256, _env_int("OCR_MAX_SIDE", 2000))
+IMAGE_CACHE_MB        = max(8, _env_int("IMAGE_CACHE_MB", 128))
+# OCR_TILING=1: images with a side longer than OCR_MAX_SIDE are OCR'd at up to OCR_TILE_MAX_SIDE
+# instead of being shrunk: cut into OCR_TILE_SIZE tiles overlapping by at least OCR_TILE_OVERLAP px,
+# spread over the engine pool, boxes merged back. Worth it for small print on large scans; costs
+# several times the CPU otherwise, hence off by default. Multi-page TIFFs and PDFs (rendered at
+# OCR_PDF_DPI, at most OCR_MAX_PAGES pages) always fan out their pages over the pool.
+OCR_TILING            = _env_flag("OCR_TILING", False)
+OCR_TILE_SIZE         = max(320, _env_int("OCR_TILE_SIZE", 1600))
+OCR_TILE_OVERLAP      = max(0, min(OCR_TILE_SIZE // 2, _env_int("OCR_TILE_OVERLAP", 160)))
+OCR_TILE_MAX_SIDE     = max(OCR_MAX_SIDE, _env_int("OCR_TILE_MAX_SIDE", 8000))
+OCR_PDF_DPI           = max(72, _env_int("OCR_PDF_DPI", 200))
+OCR_MAX_PAGES         = max(1, _env_int("OCR_MAX_PAGES", 200))
+
+# DETR object detection: backend "torch" (fp32), "int8" (dynamic-quantized Linear layers)
+# or "onnx" (exported once under MODEL_DIR, run with ONNX Runtime).
+# Concurrent requests are grouped into one forward pass of up to DETR_MAX_BATCH images,
+# waiting at most DETR_BATCH_WAIT_MS for the batch to fill.
+DETR_BACKEND        = str(get_secret("DETR_BACKEND", "torch")).strip().lower()
+DETR_MAX_BATCH      = max(1, _env_int("DETR_MAX_BATCH", 4))
+DETR_BATCH_WAIT_MS  = max(0, _env_int("DETR_BATCH_WAIT_MS", 10))
+MODEL_DIR = Path(get_secret("MODEL_DIR", str(DATA_BASE / "models"))).resolve()
+
+# tool_node runs a turn's tool calls concurrently, at most TOOL_MAX_CONCURRENCY at once.
+# Per-tool timeouts (seconds) can be overridden with TOOL_TIMEOUT_<NAME>, e.g. TOOL_TIMEOUT_OCR=30.
+TOOL_MAX_CONCURRENCY = max(1, _env_int("TOOL_MAX_CONCURRENCY", 4))
+TOOL_TIMEOUTS = {
+    name: max(1, _env_int(f"TOOL_TIMEOUT_{name.upper()}", default))
+    for name, default in {"tavily_search": 30, "ocr": 60, "obj_detect": 120}.items()
+}
+TOOL_DEFAULT_TIMEOUT = max(1, _env_int("TOOL_TIMEOUT", 60))
+
+# Outbound HTTP (Tavily, image URLs) shares one keep-alive session: up to HTTP_POOL_MAXSIZE
+# connections per host, HTTP_RETRIES retries with exponential backoff (HTTP_BACKOFF_S * 2^n) on
+# connection errors and 429/5xx. Image downloads are streamed and abort past IMAGE_MAX_MB.
+HTTP_POOL_MAXSIZE       = max(1, _env_int("HTTP_POOL_MAXSIZE", 16))
+HTTP_RETRIES            = max(0, _env_int("HTTP_RETRIES", 3))
+HTTP_BACKOFF_S          = float(get_secret("HTTP_BACKOFF_S", "0.5"))
+HTTP_CONNECT_TIMEOUT_S  = float(get_secret("HTTP_CONNECT_TIMEOUT_S", "5"))
+IMAGE_MAX_MB            = max(1, _env_int("IMAGE_MAX_MB", 20))
+TAVILY_URL              = str(get_secret("TAVILY_URL", "https://api.tavily.com/search")).strip()
+
+# Tool result cache: in-memory LRU in front of an on-disk tier under CACHE_DIR.
+# Keys hash the image bytes (or normalized query) plus tool arguments.
+RESULT_CACHE        = _env_flag("RESULT_CACHE", True)
+CACHE_DIR           = Path(get_secret("CACHE_DIR", str(DATA_BASE / "cache"))).resolve()
+CACHE_MEM_ITEMS     = max(0, _env_int("CACHE_MEM_ITEMS", 256))
+CACHE_DISK_MB       = max(1, _env_int("CACHE_DISK_MB", 256))   # per tool
+CACHE_TTL_TAVILY_S  = _env_int("CACHE_TTL_TAVILY_S", 3600)            # web answers go stale
+CACHE_TTL_VISION_S  = _env_int("CACHE_TTL_VISION_S", 30 * 24 * 3600)  # same pixels, same output
+
+# agent_node's chat model: one tool-bound ChatOpenAI per model, sharing a keep-alive pool of
+# LLM_POOL_MAXSIZE connections (async calls get one pool per event loop). LLM_CACHE=1 answers exact
+# repeats of a prompt (same messages, tools and model) from CACHE_DIR/llm, trimmed to LLM_CACHE_MB;
+# meant for evaluation runs and retried turns, so it's off by default.
+LLM_POOL_MAXSIZE    = max(1, _env_int("LLM_POOL_MAXSIZE", 16))
+LLM_TIMEOUT_S       = max(1, _env_int("LLM_TIMEOUT_S", 60))
+LLM_MAX_RETRIES     = max(0, _env_int("LLM_MAX_RETRIES", 2))
+LLM_CACHE           = _env_flag("LLM_CACHE", False)
+LLM_CACHE_TTL_S     = _env_int("LLM_CACHE_TTL_S", 7 * 24 * 3600)
+LLM_CACHE_MB        = max(1, _env_int("LLM_CACHE_MB", 256))
+
+# RAG_MODE "synthesize" (default) asks the query engine's LLM for a summary before agent_node;
+# "retrieve" skips that LLM call and injects the top-k chunks, deduplicated and truncated to
+# RAG_CONTEXT_TOKENS, straight into the system context.
+RAG_MODE            = str(get_secret("RAG_MODE", "synthesize")).strip().lower()
+RAG_TOP_K           = max(1, _env_int("RAG_TOP_K", 5))
+RAG_CONTEXT_TOKENS  = max(64, _env_int("RAG_CONTEXT_TOKENS", 1500))
+# RAG_RETRIEVAL "vector" (default) embeds every query. "hybrid" first looks the query up in a BM25
+# index of the same chunks: when the best chunk holds >= RAG_BM25_CONFIDENCE of the query's IDF
+# weight, BM25 alone answers (no embedding call, semantic cache skipped); otherwise BM25 and
+# vector rankings are fused (reciprocal rank fusion).
+RAG_RETRIEVAL       = str(get_secret("RAG_RETRIEVAL", "vector")).strip().lower()
+RAG_BM25_CONFIDENCE = float(get_secret("RAG_BM25_CONFIDENCE", "0.85"))
+
+# Semantic cache in front of RAG: a query whose embedding has cosine similarity >=
+# SEMANTIC_CACHE_THRESHOLD with a cached one reuses its RAG context. Cleared whenever the
+# index content changes; LRU-bounded by entry count and memory.
+SEMANTIC_CACHE            = _env_flag("SEMANTIC_CACHE", True)
+SEMANTIC_CACHE_THRESHOLD  = float(get_secret("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_ENTRIES    = max(1, _env_int("SEMANTIC_CACHE_ENTRIES", 1000))
+SEMANTIC_CACHE_MB         = max(1, _env_int("SEMANTIC_CACHE_MB", 64))
+
+# Index builds: files are parsed by INDEX_PARSE_WORKERS processes; chunk embeddings are cached
+# under CACHE_DIR by (model, chunk text), and misses are embedded EMBED_BATCH_SIZE chunks per
+# call with at most EMBED_CONCURRENCY calls in flight.
+INDEX_PARSE_WORKERS = max(1, _env_int("INDEX_PARSE_WORKERS", min(4, os.cpu_count() or 1)))
+EMBED_CACHE         = _env_flag("EMBED_CACHE", True)
+EMBED_BATCH_SIZE    = max(1, _env_int("EMBED_BATCH_SIZE", 256))
+EMBED_CONCURRENCY   = max(1, _env_int("EMBED_CONCURRENCY", 4))
+# Chunks are embedded and inserted INDEX_BATCH_SIZE at a time, which bounds build memory
+INDEX_BATCH_SIZE    = max(1, _env_int("INDEX_BATCH_SIZE", EMBED_BATCH_SIZE * EMBED_CONCURRENCY))
+
+# Conversation memory: LangGraph checkpoints in a local SQLite file. Only the newest
+# CHECKPOINT_KEEP checkpoints per thread are kept; threads idle for THREAD_IDLE_TTL_S are deleted.
+CHECKPOINT_DB       = Path(get_secret("CHECKPOINT_DB", str(DATA_BASE / "checkpoints.sqlite"))).resolve()
+CHECKPOINT_KEEP     = max(1, _env_int("CHECKPOINT_KEEP", 3))
+THREAD_IDLE_TTL_S   = max(60, _env_int("THREAD_IDLE_TTL_S", 24 * 3600))
+# Stored history keeps at most HISTORY_MAX_TURNS user turns. Before each model call the prompt
+# is compacted to HISTORY_TOKEN_BUDGET tokens: stale RAG contexts and repeated system prompts
+# are dropped, earlier tool outputs clipped to HISTORY_TOOL_CHARS, then the oldest turns dropped.
+HISTORY_MAX_TURNS    = max(1, _env_int("HISTORY_MAX_TURNS", 20))
+HISTORY_TOKEN_BUDGET = max(512, _env_int("HISTORY_TOKEN_BUDGET", 8000))
+HISTORY_TOOL_CHARS   = max(100, _env_int("HISTORY_TOOL_CHARS", 1500))
+
+# Tool artifacts (annotated images, uploads) are content-addressed files under OUTPUT_DIR/artifacts;
+# messages only carry 'artifact://' handles. Files untouched for ARTIFACT_TTL_S are deleted.
+ARTIFACT_TTL_S      = max(60, _env_int("ARTIFACT_TTL_S", 7 * 24 * 3600))
+
+# Instrumentation (off by default; no cost when off). TRACE=1 appends one JSON line per span /
+# event (nodes, tools, image loads, model loads, cache lookups) to TRACE_DIR/trace-YYYYMMDD.jsonl.
+# METRICS_PORT>0 serves Prometheus counters and histograms at http://METRICS_HOST:METRICS_PORT/metrics.
+TRACE               = _env_flag("TRACE")
+TRACE_DIR           = Path(get_secret("TRACE_DIR", str(DATA_BASE / "traces"))).resolve()
+METRICS_PORT        = max(0, _env_int("METRICS_PORT", 0))
+METRICS_HOST        = str(get_secret("METRICS_HOST", "127.0.0.1")).strip()
@@ -1,48 +1,121 @@
 # app/graph.py
+import uuid
 from typing import Annotated, Sequence, TypedDict, NotRequired
-import operator
 from langgraph.graph import StateGraph, START, END
-from langchain_openai import ChatOpenAI
+from langgraph.config import get_stream_writer
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_core.messages import BaseMessage, SystemMessage, ToolMessage
-from app.config import OPENAI_API_KEY, OPENAI_MODEL
-from app.rag.indexer import QUERY_ENGINE
+from app.config import OPENAI_MODEL, RAG_MODE
 from app.tools import tavily_search, ocr, obj_detect
+from app.tools.executor import run_tools, is_error_output
 from app.utils import extract_user_text
-from langgraph.checkpoint.memory import MemorySaver
+from app.checkpoint import get_checkpointer
+from app.history import RAG_CONTEXT_PREFIX, compact_for_prompt, count_message_tokens, merge_messages
+from app import llm as llm_client, telemetry
 from typing_extensions import TypedDict
 
 class State(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], operator.add]
+    # Appends like operator.add, then drops repeated system prompts, stale RAG contexts and old turns
+    messages: Annotated[Sequence[BaseMessage], merge_messages]
     output: NotRequired[str]
+    trace_id: NotRequired[str]  # set by rag_node when instrumentation is on; groups one turn's spans
 
 def _llm_with_tools():
-    llm = ChatOpenAI(model=OPENAI_MODEL, api_key=OPENAI_API_KEY)
-    return llm.bind_tools([tavily_search, ocr, obj_detect], tool_choice="auto")
+    # Built once per model (and event loop) with a pooled HTTP client; see app/llm.py
+    return llm_client.get_chat_model([tavily_search, ocr, obj_detect], OPENAI_MODEL)
 
-def rag_node(state: State) -> State:
+def _rag_context(user_text: str) -> str:
+    # Imported on first use so building the graph doesn't pull in llama_index / load the index
+    from app.rag import rag_context
+    return rag_context(user_text)
+
+def _thread_id(config: RunnableConfig | None) -> str | None:
+    return ((config or {}).get("configurable") or {}).get("thread_id")
+
+def rag_node(state: State, config: RunnableConfig = None) -> State:
     user_text = extract_user_text(state["messages"])
-    try:
-        rag_resp = QUERY_ENGINE.query(user_text)
-        rag_answer = getattr(rag_resp, "response", str(rag_resp))
-        ctx = (
-            "RAG context (for the assistant to use as background):\n"
-            f"{rag_answer}\n"
-            "End of RAG context."
-        )
-        return {"messages": [SystemMessage(content=ctx)]}
-    except Exception as e:
-        return {"messages": [SystemMessage(content=f"RAG context unavailable: {e}")]}
+    trace_id = telemetry.start_trace()  # rag is the first node of every turn
+    with telemetry.use_trace(trace_id, _thread_id(config)), telemetry.span("node.rag", mode=RAG_MODE) as sp:
+        try:
+            rag_text = _rag_context(user_text)
+            if RAG_MODE == "retrieve":
+                # Retrieval only: no synthesis LLM call, agent_node reads the passages directly
+                ctx = (
+                    f"{RAG_CONTEXT_PREFIX} (retrieved passages, for the assistant to use as background):\n"
+                    f"{rag_text or '(no relevant passages found)'}\n"
+                    "End of RAG context."
+                )
+            else:
+                ctx = (
+                    f"{RAG_CONTEXT_PREFIX} (for the assistant to use as background):\n"
+                    f"{rag_text}\n"
+                    "End of RAG context."
+                )
+        except Exception as e:
+            ctx = f"{RAG_CONTEXT_PREFIX} unavailable: {e}"
+            sp.set(ok=False, error=str(e))
+        sp.set(context_chars=len(ctx))
+    out = {"messages": [SystemMessage(content=ctx)]}
+    if trace_id:
+        out["trace_id"] = trace_id
+    return out
 
-def agent_node(state: State) -> State:
-    llm = _llm_with_tools()
-    resp = llm.invoke(state["messages"])
+def _prompt(state: State, config: RunnableConfig | None) -> list[BaseMessage]:
+    """Token-budgeted view of the history for this model call; records per-thread prompt stats."""
+    prompt = compact_for_prompt(state["messages"])
+    thread_id = _thread_id(config)
+    if thread_id:
+        sent = count_message_tokens(prompt)
+        get_checkpointer().record_prompt(thread_id, sent, count_message_tokens(state["messages"]) - sent)
+    if telemetry.ENABLED:
+        telemetry.payload("prompt", sum(len(str(m.content)) for m in prompt))
+    return prompt
+
+def _record_response(sp, resp: BaseMessage):
+    usage = getattr(resp, "usage_metadata", None)
+    telemetry.llm_tokens(OPENAI_MODEL, usage)
+    sp.set(tool_calls=len(getattr(resp, "tool_calls", None) or []), **(usage or {}))
+
+def agent_node(state: State, config: RunnableConfig = None) -> State:
+    with telemetry.use_trace(state.get("trace_id"), _thread_id(config)), telemetry.span("node.agent") as sp:
+        resp = llm_client.invoke(_llm_with_tools(), _prompt(state, config))
+        _record_response(sp, resp)
     return {"messages": [resp]}
 
-def tool_node(state: State) -> State:
-    last = state["messages"][-1]
+async def aagent_node(state: State, config: RunnableConfig = None) -> State:
+    with telemetry.use_trace(state.get("trace_id"), _thread_id(config)), telemetry.span("node.agent") as sp:
+        resp = await llm_client.ainvoke(_llm_with_tools(), _prompt(state, config))
+        _record_response(sp, resp)
+    return {"messages": [resp]}
+
+def _stream_writer():
+    try:
+        return get_stream_writer()
+    except RuntimeError:  # called outside a graph run
+        return lambda _: None
+
+def _traced_tool(name: str, fn):
+    """fn wrapped in a tool.<name> span, carrying the turn's trace context into the worker thread."""
+    if not telemetry.ENABLED:
+        return fn
+    def run():
+        with telemetry.span(f"tool.{name}") as sp:
+            out = fn()
+            sp.set(ok=not is_error_output(out), output_bytes=len(out.encode("utf-8")))
+            telemetry.payload("tool_output", len(out))
+            return out
+    return telemetry.bind(run)
+
+def tool_node(state: State, config: RunnableConfig = None) -> State:
+    with telemetry.use_trace(state.get("trace_id"), _thread_id(config)), telemetry.span("node.tools") as sp:
+        return _run_tool_calls(state["messages"][-1], sp)
+
+def _run_tool_calls(last: BaseMessage, sp) -> State:
     tool_messages = []
     if getattr(last, "tool_calls", None):
+        sp.set(tools=[tc["name"] for tc in last.tool_calls])
         tool_map = {"tavily_search": tavily_search, "ocr": ocr, "obj_detect": obj_detect}
+        jobs = []
         for tc in last.tool_calls:
             name = tc["name"]
             args = tc.get("args", {}) or {}
@@ -53,7 +126,19 @@ def tool_node(state: State) -> State:
                     args = {"hint": args}
                 elif name == "obj_detect":
                     args = {"image": args}
-            out = tool_map[name].invoke(args)
+            if name not in tool_map:
+                jobs.append((name, lambda name=name: f"[{name} error] unknown tool"))
+                continue
+            jobs.append((name, _traced_tool(name, lambda t=tool_map[name], a=args: t.invoke(a))))
+        # Run all calls of this turn concurrently; outputs come back in tool_call order.
+        # tool_start/tool_end go to stream_mode="custom" listeners as they happen.
+        write = _stream_writer()
+        calls = last.tool_calls
+        for tc in calls:
+            write({"event": "tool_start", "name": tc["name"], "id": tc["id"], "args": tc.get("args")})
+        on_done = lambda i, out: write({"event": "tool_end", "name": calls[i]["name"], "id": calls[i]["id"],
+                                        "ok": not is_error_output(out)})
+        for tc, out in zip(calls, run_tools(jobs, on_done=on_done)):
             tool_messages.append(ToolMessage(content=out, tool_call_id=tc["id"]))
     return {"messages": tool_messages}
 
@@ -64,15 +149,18 @@ def should_continue(state: State) -> str:
 def build_graph():
     builder = StateGraph(State)
     builder.add_node("rag", rag_node)
-    builder.add_node("agent", agent_node)
+    # Sync and async implementations: graph.invoke uses agent_node, ainvoke/astream aagent_node
+    builder.add_node("agent", RunnableLambda(agent_node, afunc=aagent_node, name="agent"))
     builder.add_node("tools", tool_node)
     builder.add_edge(START, "rag")
     builder.add_edge("rag", "agent")
     builder.add_conditional_edges("agent", should_continue, {"tools": "tools", END: END})
     builder.add_edge("tools", "agent")
     
-    memory = MemorySaver()
-    graph = builder.compile(checkpointer=memory)
+    telemetry.start_metrics_server()  # no-op unless METRICS_PORT is set
+
+    # Shared SQLite checkpointer: bounded per thread, idle threads evicted
+    graph = builder.compile(checkpointer=get_checkpointer())
 
     # You can keep returning a system message from here if you prefer:
     system_msg = SystemMessage(
@@ -83,12 +171,13 @@ def build_graph():
             "Goal: Answer the user. Call tools ONLY if they materially improve the result.\n"
             "Tools:\n"
             "- ocr(hint): extract English text but ignore Chinese.\n"
-            "- obj_detect(image): detect objects on a local image; returns detections and a saved annotated image path (and data_url if available).\n"
+            "- obj_detect(image): detect objects on a local image; returns detections and an artifact handle for the annotated image (shown to the user automatically).\n"
             "- tavily_search(query): helpful for external facts/sources.\n"
             "If ocr is called, prefer sensible English tokens; ignore gibberish.\n"
         )
     )
 
-    # IMPORTANT: keep the same thread_id across turns to reuse memory.
-    config = {"configurable": {"thread_id": "run-1"}}
+    # Checkpoints persist across processes, so each graph gets its own thread_id; reuse this
+    # config for follow-up turns of the same conversation (memory), not for unrelated runs.
+    config = {"configurable": {"thread_id": f"run-{uuid.uuid4().hex}"}}
     return graph, config, system_msg
@@ -0,0 +1,109 @@
+# app/history.py
+from functools import lru_cache
+from typing import Sequence
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from app.config import OPENAI_MODEL, HISTORY_MAX_TURNS, HISTORY_TOKEN_BUDGET, HISTORY_TOOL_CHARS
+
+RAG_CONTEXT_PREFIX = "RAG context"
+
+def _text(msg: BaseMessage) -> str:
+    content = msg.content
+    if isinstance(content, str):
+        return content
+    return "\n".join(p.get("text", "") if isinstance(p, dict) else str(p) for p in content)
+
+def is_rag_context(msg: BaseMessage) -> bool:
+    return isinstance(msg, SystemMessage) and _text(msg).startswith(RAG_CONTEXT_PREFIX)
+
+@lru_cache(maxsize=1)
+def _encoder():
+    """tiktoken encode() for the chat model; ~4 chars/token if the encoding can't be loaded (offline)."""
+    try:
+        import tiktoken
+        try:
+            enc = tiktoken.encoding_for_model(OPENAI_MODEL)
+        except KeyError:
+            enc = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(enc.encode(text, disallowed_special=()))
+    except Exception:
+        return lambda text: (len(text) + 3) // 4
+
+def count_message_tokens(messages: Sequence[BaseMessage]) -> int:
+    """Approximate prompt tokens: content + tool-call arguments + ~4 tokens of framing per message."""
+    count = _encoder()
+    total = 0
+    for m in messages:
+        total += 4 + count(_text(m))
+        for tc in getattr(m, "tool_calls", None) or []:
+            total += count(f"{tc['name']}{tc.get('args')}")
+    return total
+
+def _turn_starts(messages: Sequence[BaseMessage]) -> list[int]:
+    return [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+
+def prune_history(messages: Sequence[BaseMessage], max_turns: int = HISTORY_MAX_TURNS) -> list[BaseMessage]:
+    """
+    Drop what no later model call needs: repeats of an identical system prompt,
+    RAG contexts superseded by a newer one, and user turns beyond max_turns.
+    """
+    last_rag = max((i for i, m in enumerate(messages) if is_rag_context(m)), default=-1)
+    seen_system: set[str] = set()
+    kept = []
+    for i, m in enumerate(messages):
+        if isinstance(m, SystemMessage):
+            if is_rag_context(m):
+                if i != last_rag:
+                    continue
+            elif _text(m) in seen_system:
+                continue
+            else:
+                seen_system.add(_text(m))
+        kept.append(m)
+    starts = _turn_starts(kept)
+    if len(starts) > max_turns:
+        cut = starts[-max_turns]
+        # Leading system prompts stay; whole old turns go, so tool calls and results stay paired
+        kept = [m for m in kept[:cut] if isinstance(m, SystemMessage) and not is_rag_context(m)] + kept[cut:]
+    return kept
+
+def merge_messages(left: Sequence[BaseMessage], right: Sequence[BaseMessage]) -> list[BaseMessage]:
+    """Reducer for State.messages: operator.add followed by prune_history."""
+    return prune_history(list(left) + list(right))
+
+def _clip(msg: ToolMessage, limit: int) -> ToolMessage:
+    text = _text(msg)
+    if len(text) <= limit:
+        return msg
+    return msg.model_copy(update={"content": text[:limit] + f"… [truncated {len(text) - limit} chars]"})
+
+def compact_for_prompt(messages: Sequence[BaseMessage], token_budget: int = HISTORY_TOKEN_BUDGET,
+                       tool_chars: int = HISTORY_TOOL_CHARS) -> list[BaseMessage]:
+    """
+    The message list agent_node sends to the model. The current turn (from the
+    last user message on) is kept intact; tool outputs of earlier turns are
+    clipped, then earlier turns are dropped oldest-first until the prompt fits.
+    """
+    msgs = prune_history(messages)
+    starts = _turn_starts(msgs)
+    if not starts:
+        return msgs
+    current = starts[-1]
+    head, tail = msgs[:starts[0]], msgs[current:]
+    past = [_clip(m, tool_chars) if isinstance(m, ToolMessage) else m for m in msgs[starts[0]:current]]
+
+    turns = [[]]
+    for m in past:
+        if isinstance(m, HumanMessage) and turns[-1]:
+            turns.append([])
+        turns[-1].append(m)
+    turns = [t for t in turns if t]
+
+    fixed = count_message_tokens(head + tail)
+    sizes = [count_message_tokens(t) for t in turns]
+    dropped = 0
+    while turns and fixed + sum(sizes) > token_budget:
+        turns.pop(0)
+        sizes.pop(0)
+        dropped += 1
+    note = [SystemMessage(content=f"({dropped} earlier turn(s) omitted to fit the context budget.)")] if dropped else []
+    return head + note + [m for t in turns for m in t] + tail
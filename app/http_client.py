@@ -0,0 +1,78 @@
+# app/http_client.py
+import threading
+from PIL import Image, ImageFile
+from app.config import HTTP_POOL_MAXSIZE, HTTP_RETRIES, HTTP_BACKOFF_S, HTTP_CONNECT_TIMEOUT_S, IMAGE_MAX_MB
+
+_CHUNK = 64 * 1024
+
+class ResponseTooLarge(ValueError):
+    pass
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+def get_session():
+    """
+    Process-wide requests.Session: keep-alive pools of up to HTTP_POOL_MAXSIZE
+    connections per host, so repeat calls skip the TCP/TLS handshake, and
+    urllib3 retries (backoff, Retry-After) on connection errors and 429/5xx.
+    """
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util import Retry
+            retry = Retry(
+                total=HTTP_RETRIES, backoff_factor=HTTP_BACKOFF_S, backoff_max=30,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset({"GET", "HEAD", "POST"}),  # our POSTs (Tavily search) are idempotent
+                respect_retry_after_header=True,
+                raise_on_status=False,  # the last response comes back; callers use raise_for_status()
+            )
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _SESSION = session
+        return _SESSION
+
+def timeout(read_s: float) -> tuple[float, float]:
+    """(connect, read) timeout for requests: connecting fails fast, reading gets read_s."""
+    return (min(HTTP_CONNECT_TIMEOUT_S, read_s), read_s)
+
+def fetch_image_bytes(url: str, max_bytes: int = IMAGE_MAX_MB * 1024 * 1024, read_timeout: float = 15) -> bytes:
+    """
+    Download an image in chunks, at most max_bytes. The first chunks go through
+    PIL's incremental parser, so a response that isn't an image, or whose
+    header declares more than Image.MAX_IMAGE_PIXELS, is dropped before the
+    rest of the body is read. Returns the encoded bytes (decoding happens later,
+    at the size each model needs).
+    """
+    with get_session().get(url, stream=True, timeout=timeout(read_timeout)) as r:
+        r.raise_for_status()
+        declared = int(r.headers.get("Content-Length") or 0)
+        if declared > max_bytes:
+            raise ResponseTooLarge(f"image is {declared} bytes, limit is {max_bytes}")
+        buf = bytearray()
+        parser = ImageFile.Parser()
+        header_ok = False
+        for chunk in r.iter_content(_CHUNK):
+            buf += chunk
+            if len(buf) > max_bytes:
+                raise ResponseTooLarge(f"image exceeds {max_bytes} bytes")
+            if not header_ok:
+                try:
+                    parser.feed(chunk)
+                except Exception as e:
+                    raise ValueError(f"not an image ({r.headers.get('Content-Type', 'unknown type')}): {e}") from e
+                if parser.image is not None:
+                    w, h = parser.image.size
+                    if Image.MAX_IMAGE_PIXELS and w * h > 2 * Image.MAX_IMAGE_PIXELS:
+                        raise ValueError(f"image is {w}x{h} pixels, too large to decode")
+                    header_ok = True
+                elif len(buf) > 4 * _CHUNK:  # no image header in the first 256 KB
+                    raise ValueError(f"not an image ({r.headers.get('Content-Type', 'unknown type')})")
+        if not header_ok:
+            raise ValueError(f"not an image ({r.headers.get('Content-Type', 'unknown type')})")
+        return bytes(buf)
@@ -0,0 +1,136 @@
+# app/images.py
+import base64, hashlib, io, os, threading
+from collections import OrderedDict
+from typing import Iterator
+from PIL import Image, ImageSequence
+from app.config import IMAGE_CACHE_MB
+from app import telemetry
+
+class ImageHandle:
+    """
+    One image source (path, data URL or http URL), read and hashed once.
+    Keeps the encoded bytes; decoded RGB copies are made per target size via
+    rgb(), decoding JPEGs directly at reduced scale (draft mode) when possible,
+    so a 12 MP photo never needs a full-resolution RGB buffer for a model that
+    only looks at ~1 MP.
+    """
+
+    def __init__(self, data: bytes, name: str = "image"):
+        self.data, self.name = data, name
+        self.digest = hashlib.sha256(data).hexdigest()
+        with Image.open(io.BytesIO(data)) as im:
+            self.size = im.size  # (W, H), header only
+            # Pages of a multi-page TIFF (animated GIF/PNG frames aren't pages; their first frame is used)
+            self.n_frames = getattr(im, "n_frames", 1) if im.format == "TIFF" else 1
+        self._rgb: dict[tuple[int, int], Image.Image] = {}
+        self._lock = threading.Lock()
+
+    def target_size(self, max_side: int | None = None, max_short: int | None = None) -> tuple[int, int]:
+        """Largest size <= original with longest side <= max_side and shortest side <= max_short."""
+        w, h = self.size
+        scale = 1.0
+        if max_side:
+            scale = min(scale, max_side / max(w, h))
+        if max_short:
+            scale = min(scale, max_short / min(w, h))
+        return max(1, round(w * scale)), max(1, round(h * scale))
+
+    def rgb(self, max_side: int | None = None, max_short: int | None = None) -> Image.Image:
+        """RGB image at target_size(...); shared between callers, so treat it as read-only."""
+        size = self.target_size(max_side, max_short)
+        with self._lock:
+            img = self._rgb.get(size)
+            if img is None:
+                with telemetry.span("image.decode", width=size[0], height=size[1]):
+                    im = Image.open(io.BytesIO(self.data))
+                    if size != self.size:
+                        im.draft("RGB", size)  # JPEG: DCT-domain downscale while decoding
+                    im = im.convert("RGB")
+                    if im.size != size:
+                        im = im.resize(size, Image.Resampling.LANCZOS)
+                img = self._rgb[size] = im
+            return img
+
+    def frames(self, max_side: int | None = None) -> Iterator[Image.Image]:
+        """Each frame / page as RGB, longest side <= max_side; decoded on demand and not cached."""
+        with Image.open(io.BytesIO(self.data)) as im:
+            for frame in ImageSequence.Iterator(im):
+                page = frame.convert("RGB")
+                if max_side and max(page.size) > max_side:
+                    page.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+                yield page
+
+    def scale_to_original(self, img: Image.Image) -> tuple[float, float]:
+        """Factors (sx, sy) that map coordinates on `img` back to the original image."""
+        return self.size[0] / img.size[0], self.size[1] / img.size[1]
+
+    def nbytes(self) -> int:
+        return len(self.data) + sum(w * h * 3 for w, h in self._rgb)
+
+def _read_source(image: str) -> tuple[bytes, str]:
+    if os.path.exists(image):
+        with open(image, "rb") as f:
+            return f.read(), os.path.basename(image)
+    if image.startswith("data:image"):
+        encoded = "".join(image.split(",", 1)[1].split())
+        encoded += "=" * ((-len(encoded)) % 4)
+        return base64.b64decode(encoded, validate=False), "image"
+    if image.startswith(("http://", "https://")):
+        from app.http_client import fetch_image_bytes
+        return fetch_image_bytes(image), os.path.basename(image.split("?", 1)[0]) or "image"
+    raise ValueError("invalid image input (not a path, data URL, or http URL)")
+
+def _source_key(image: str) -> str:
+    if os.path.exists(image):
+        st = os.stat(image)
+        return f"path:{os.path.abspath(image)}:{st.st_mtime_ns}:{st.st_size}"
+    return "src:" + hashlib.sha1(image.encode("utf-8")).hexdigest()
+
+class _HandleCache:
+    """Small LRU of ImageHandles (bounded by bytes), with one decode per source even under concurrency."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: OrderedDict[str, ImageHandle] = OrderedDict()
+        self._loading: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, image: str) -> ImageHandle:
+        key = _source_key(image)
+        with self._lock:
+            handle = self._items.get(key)
+            if handle is not None:
+                self._items.move_to_end(key)
+                telemetry.event("cache", cache="images", result="hit")
+                return handle
+            load_lock = self._loading.setdefault(key, threading.Lock())
+        with load_lock:  # a concurrent caller for the same source waits for this read
+            try:
+                with self._lock:
+                    handle = self._items.get(key)
+                if handle is None:
+                    with telemetry.span("image.load", source=key.split(":", 1)[0]) as sp:
+                        handle = ImageHandle(*_read_source(image))
+                        sp.set(bytes=len(handle.data), width=handle.size[0], height=handle.size[1])
+                    telemetry.payload("image", len(handle.data))
+                    with self._lock:
+                        self._items[key] = handle
+                        self._trim(keep=key)
+            finally:
+                with self._lock:  # also when the read failed: no lock left behind per bad source
+                    self._loading.pop(key, None)
+        return handle
+
+    def _trim(self, keep: str):
+        total = sum(h.nbytes() for h in self._items.values())
+        for key in list(self._items):
+            if total <= self.max_bytes:
+                break
+            if key != keep:
+                total -= self._items.pop(key).nbytes()
+
+_HANDLES = _HandleCache(IMAGE_CACHE_MB * 1024 * 1024)
+
+def get_image(image: str) -> ImageHandle:
+    """Shared handle for a path / data URL / http URL; each source is read and decoded once."""
+    return _HANDLES.get(image)
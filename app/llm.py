@@ -0,0 +1,132 @@
+# app/llm.py
+import asyncio, json, threading
+from typing import Sequence
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from app.config import OPENAI_API_KEY, OPENAI_MODEL, OPENAI_BASE_URL
+from app.config import LLM_POOL_MAXSIZE, LLM_TIMEOUT_S, LLM_MAX_RETRIES, LLM_CACHE, LLM_CACHE_TTL_S, LLM_CACHE_MB
+from app.cache import cache_key, get_cache
+
+_LOCK = threading.Lock()
+_http_client = None
+_SYNC_MODELS: dict[tuple, object] = {}
+# An async httpx pool is bound to one event loop, so async turns all run on this one
+_loop: asyncio.AbstractEventLoop | None = None
+_ASYNC_MODELS: dict[tuple, object] = {}
+
+def event_loop() -> asyncio.AbstractEventLoop:
+    """The process-wide event loop for async turns, running forever on one daemon thread."""
+    global _loop
+    with _LOCK:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-loop", daemon=True).start()
+        return _loop
+
+def submit(coro):
+    """Schedule coro on event_loop(); returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, event_loop())
+
+def run(coro):
+    """asyncio.run(coro), but on the shared loop so every turn reuses the same async pool."""
+    fut = submit(coro)
+    try:
+        return fut.result()
+    except BaseException:
+        fut.cancel()
+        raise
+
+def _limits():
+    import httpx
+    return httpx.Limits(max_connections=LLM_POOL_MAXSIZE, max_keepalive_connections=LLM_POOL_MAXSIZE)
+
+def _build(model: str, tools: Sequence, async_client=None):
+    global _http_client
+    import httpx
+    from langchain_openai import ChatOpenAI
+    if _http_client is None:
+        _http_client = httpx.Client(limits=_limits(), timeout=LLM_TIMEOUT_S)
+    # streaming=True lets graph.stream/astream(stream_mode="messages") emit tokens as they arrive
+    llm = ChatOpenAI(model=model, api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, streaming=True,
+                     stream_usage=True, timeout=LLM_TIMEOUT_S, max_retries=LLM_MAX_RETRIES,
+                     http_client=_http_client, http_async_client=async_client)
+    return llm.bind_tools(list(tools), tool_choice="auto")
+
+def get_chat_model(tools: Sequence, model: str = OPENAI_MODEL):
+    """
+    The tool-bound chat model for `model`, built once and reused by every
+    agent step. Sync calls share one httpx keep-alive pool per process, and
+    async calls on event_loop() share one async pool. Any other running loop
+    gets the sync model, whose async calls use the client library's default pool.
+    """
+    key = (model, tuple(t.name for t in tools))
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    with _LOCK:
+        if loop is None or loop is not _loop:
+            if key not in _SYNC_MODELS:
+                _SYNC_MODELS[key] = _build(model, tools)
+            return _SYNC_MODELS[key]
+        if key not in _ASYNC_MODELS:
+            import httpx
+            _ASYNC_MODELS[key] = _build(model, tools, httpx.AsyncClient(limits=_limits(), timeout=LLM_TIMEOUT_S))
+        return _ASYNC_MODELS[key]
+
+# --- exact-match response cache (LLM_CACHE) ---
+
+def _normalized(messages: Sequence[BaseMessage]) -> list[dict]:
+    """What the model sees: role, content, tool calls; message ids and metadata vary run to run."""
+    out = []
+    for m in messages:
+        content = m.content.strip() if isinstance(m.content, str) else m.content
+        entry = {"type": m.type, "content": content}
+        if getattr(m, "tool_calls", None):
+            entry["tool_calls"] = [[tc["name"], tc["args"], tc.get("id")] for tc in m.tool_calls]
+        if getattr(m, "tool_call_id", None):
+            entry["tool_call_id"] = m.tool_call_id
+        out.append(entry)
+    return out
+
+def _key(llm, messages: Sequence[BaseMessage]) -> str:
+    bound = getattr(llm, "bound", llm)
+    model = getattr(bound, "model_name", None) or type(bound).__name__
+    params = {k: getattr(bound, k, None) for k in ("temperature", "top_p", "max_tokens", "seed")}
+    # bind_tools() kwargs hold the tool schemas in OpenAI format and tool_choice
+    return cache_key("llm", model, params, getattr(llm, "kwargs", {}), _normalized(messages))
+
+def _cache():
+    return get_cache("llm", LLM_CACHE_TTL_S, max_disk_mb=LLM_CACHE_MB)
+
+def _load(value: str) -> BaseMessage:
+    msg = messages_from_dict([json.loads(value)])[0]
+    # A replayed answer cost no tokens, and gets a fresh id in the new thread
+    return msg.model_copy(update={"id": None, "usage_metadata": None,
+                                  "response_metadata": {**msg.response_metadata, "cache": "hit"}})
+
+def _store(key: str, resp: BaseMessage):
+    if not getattr(resp, "invalid_tool_calls", None):
+        _cache().set(key, json.dumps(message_to_dict(resp), ensure_ascii=False))
+
+def invoke(llm, messages: Sequence[BaseMessage]) -> BaseMessage:
+    """llm.invoke(messages), answered from the response cache when LLM_CACHE is on."""
+    if not LLM_CACHE:
+        return llm.invoke(messages)
+    key = _key(llm, messages)
+    hit = _cache().get(key)
+    if hit is not None:
+        return _load(hit)
+    resp = llm.invoke(messages)
+    _store(key, resp)
+    return resp
+
+async def ainvoke(llm, messages: Sequence[BaseMessage]) -> BaseMessage:
+    if not LLM_CACHE:
+        return await llm.ainvoke(messages)
+    key = _key(llm, messages)
+    hit = await asyncio.to_thread(_cache().get, key)
+    if hit is not None:
+        return _load(hit)
+    resp = await llm.ainvoke(messages)
+    await asyncio.to_thread(_store, key, resp)
+    return resp
@@ -1,4 +1,17 @@
 # app/rag/__init__.py
-from .indexer import QUERY_ENGINE, format_sources, build_or_load_index
+# Lazy package: llama_index and the index are only loaded on first attribute access.
+__all__ = ["QUERY_ENGINE", "format_sources", "build_or_load_index", "get_index", "get_query_engine",
+           "get_retriever", "retrieve_context", "rag_context", "semantic_cache_stats",
+           "request_reindex", "reindex_status", "get_bm25", "retrieval_stats"]
 
-__all__ = ["QUERY_ENGINE", "format_sources", "build_or_load_index"]
+def __getattr__(name: str):
+    if name in ("get_retriever", "retrieve_context", "rag_context", "semantic_cache_stats", "retrieval_stats"):
+        from . import context
+        return getattr(context, name)
+    if name in ("request_reindex", "reindex_status"):
+        from . import reindex
+        return getattr(reindex, name)
+    if name in __all__:
+        from . import indexer
+        return getattr(indexer, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,128 @@
+# app/rag/bm25.py
+import gzip, json, math, os, re, threading
+from collections import Counter
+from typing import Iterable
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.'][a-z0-9]+)*")
+_STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here
+hers him his how i if in into is it its itself just me more most my no nor not now of off on once only or
+other our ours out over own same she should so some such than that the their theirs them then there these
+they this those through to too under until up very was we were what when where which while who whom why
+will with would you your yours
+""".split())
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase words and numbers (keeps 2.5, 2021, nea's), minus English stopwords."""
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+def bm25_path(index_dir: str) -> str:
+    """Persisted next to index_store/, like the manifest: rag/index_store_bm25.json.gz."""
+    index_dir = os.path.abspath(index_dir)
+    return os.path.join(os.path.dirname(index_dir), f"{os.path.basename(index_dir)}_bm25.json.gz")
+
+class BM25Index:
+    """
+    In-process Okapi BM25 over the same chunks as the vector index. Chunks are
+    added and removed by node id as the index syncs; the inverted index is
+    kept in memory and only the per-chunk term counts are persisted.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self._docs: dict[str, Counter] = {}      # node_id -> term counts
+        self._lengths: dict[str, int] = {}
+        self._postings: dict[str, dict[str, int]] = {}  # term -> {node_id: tf}
+        self._total_len = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def node_ids(self) -> set[str]:
+        return set(self._docs)
+
+    def add(self, items: Iterable[tuple[str, str]]):
+        """(node_id, text) pairs; re-adding an id replaces it."""
+        with self._lock:
+            for node_id, text in items:
+                self._remove(node_id)
+                self._add_counts(node_id, Counter(tokenize(text)))
+
+    def _add_counts(self, node_id: str, counts: Counter):
+        self._docs[node_id] = counts
+        length = sum(counts.values())
+        self._lengths[node_id] = length
+        self._total_len += length
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[node_id] = tf
+
+    def remove(self, node_ids: Iterable[str]):
+        with self._lock:
+            for node_id in node_ids:
+                self._remove(node_id)
+
+    def _remove(self, node_id: str):
+        counts = self._docs.pop(node_id, None)
+        if counts is None:
+            return
+        self._total_len -= self._lengths.pop(node_id)
+        for term in counts:
+            posting = self._postings[term]
+            del posting[node_id]
+            if not posting:
+                del self._postings[term]
+
+    def _idf(self, term: str) -> float:
+        n, df = len(self._docs), len(self._postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, top_k: int) -> tuple[list[tuple[str, float]], float]:
+        """
+        Top-k (node_id, score) and a lexical confidence in [0, 1]: the share of
+        the query's IDF weight whose terms all occur in the best chunk (terms
+        absent from the corpus count against it).
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            if not terms or not self._docs:
+                return [], 0.0
+            avg_len = self._total_len / len(self._docs)
+            scores: dict[str, float] = {}
+            idf = {t: self._idf(t) for t in terms}
+            for term in terms:
+                for node_id, tf in self._postings.get(term, {}).items():
+                    norm = tf + self.k1 * (1 - self.b + self.b * self._lengths[node_id] / avg_len)
+                    scores[node_id] = scores.get(node_id, 0.0) + idf[term] * tf * (self.k1 + 1) / norm
+            if not scores:
+                return [], 0.0
+            hits = sorted(scores.items(), key=lambda kv: -kv[1])[:top_k]
+            best = self._docs[hits[0][0]]
+            confidence = sum(idf[t] for t in terms if t in best) / (sum(idf.values()) or 1.0)
+        return hits, confidence
+
+    def save(self, path: str):
+        with self._lock:
+            vocab = sorted(self._postings)
+            ids = {t: i for i, t in enumerate(vocab)}
+            docs = [[node_id, [x for t, tf in counts.items() for x in (ids[t], tf)]]
+                    for node_id, counts in self._docs.items()]
+        tmp = path + ".tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump({"format": 1, "k1": self.k1, "b": self.b, "vocab": vocab, "docs": docs}, f,
+                      separators=(",", ":"))
+        os.replace(tmp, path)  # atomic, like the manifest
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index | None":
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            index = cls(data["k1"], data["b"])
+            vocab = data["vocab"]
+            for node_id, flat in data["docs"]:
+                index._add_counts(node_id, Counter({vocab[flat[i]]: flat[i + 1] for i in range(0, len(flat), 2)}))
+            return index
+        except (OSError, ValueError, KeyError, IndexError, EOFError):
+            return None
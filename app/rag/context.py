@@ -0,0 +1,162 @@
+# app/rag/context.py
+import hashlib, threading
+from llama_index.core import QueryBundle, Settings
+from llama_index.core.schema import NodeWithScore
+from llama_index.core.utils import get_tokenizer
+from ..config import RAG_MODE, RAG_TOP_K, RAG_CONTEXT_TOKENS, SEMANTIC_CACHE
+from ..config import RAG_RETRIEVAL, RAG_BM25_CONFIDENCE
+from .indexer import get_bm25, get_index, get_index_version, get_query_engine, format_sources
+from .semantic_cache import SemanticCache
+from .. import telemetry
+
+_retriever = None  # (index, retriever): rebuilt when a reindex swaps the live index
+_RETRIEVER_LOCK = threading.Lock()
+
+def get_retriever():
+    global _retriever
+    index = get_index()
+    cached = _retriever
+    if cached is None or cached[0] is not index:
+        with _RETRIEVER_LOCK:
+            if _retriever is None or _retriever[0] is not index:
+                _retriever = (index, index.as_retriever(similarity_top_k=RAG_TOP_K))
+            cached = _retriever
+    return cached[1]
+
+def count_tokens(text: str) -> int:
+    return len(get_tokenizer()(text))
+
+def build_context(nodes, token_budget: int = RAG_CONTEXT_TOKENS,
+                  score_label: str = "score") -> tuple[str, list[dict]]:
+    """
+    Turn retrieved nodes into one context string under token_budget.
+    Chunks are kept in score order, exact duplicates dropped, and the last
+    chunk that doesn't fit is truncated. score_label names the score in each
+    header ("score" for cosine, "bm25", "rrf"). Returns (context, format_sources rows used).
+    """
+    encode = get_tokenizer()
+    seen, parts, used = set(), [], []
+    remaining = token_budget
+    for n, src in zip(nodes, format_sources(nodes)):
+        text = " ".join((n.node.get_content() or "").split())
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        if not text or digest in seen:
+            continue
+        seen.add(digest)
+        score = f"{src['score']:.3f}" if src["score"] is not None else "n/a"
+        # The separator and header count against the budget too
+        prefix = ("\n\n" if parts else "") + f"[{len(parts) + 1}] {src['file']} ({score_label} {score})\n"
+        size = len(encode(prefix + text))
+        if size > remaining:
+            room = remaining - len(encode(prefix))
+            if room < 32:  # not worth a fragment
+                break
+            full, cut = text, len(text)
+            while size > remaining:  # cut proportionally, then re-count: token counts aren't linear in chars
+                cut = min(cut - 1, cut * (room - 1) // max(1, size - (remaining - room)))
+                text = full[:max(0, cut)].rstrip() + " …"
+                size = len(encode(prefix + text))
+        parts.append(prefix + text)
+        used.append(src)
+        remaining -= size
+        if remaining <= 0:
+            break
+    return "".join(parts), used
+
+_RETRIEVAL_STATS = {"vector": 0, "bm25": 0, "fused": 0}
+_STATS_LOCK = threading.Lock()
+
+def _count(path: str):
+    with _STATS_LOCK:
+        _RETRIEVAL_STATS[path] += 1
+    telemetry.event("rag_retrieval", path=path)
+
+def retrieval_stats() -> dict:
+    """Queries per retrieval path; each "bm25" one answered without a query embedding call."""
+    with _STATS_LOCK:
+        stats = dict(_RETRIEVAL_STATS)
+    stats["embeddings_avoided"] = stats["bm25"]
+    return stats
+
+def _lexical(query: str) -> tuple[list[NodeWithScore], bool]:
+    """BM25 top-k of the live index, and whether it is confident enough to answer alone."""
+    index = get_index()
+    hits, confidence = get_bm25(index).search(query, RAG_TOP_K)
+    nodes = [NodeWithScore(node=index.docstore.get_node(i), score=score) for i, score in hits]
+    return nodes, bool(nodes) and confidence >= RAG_BM25_CONFIDENCE
+
+def fuse(*rankings: list[NodeWithScore], top_k: int = RAG_TOP_K, k: int = 60) -> list[NodeWithScore]:
+    """Reciprocal rank fusion: a chunk scores sum(1 / (k + rank)) over the rankings it appears in."""
+    scores: dict[str, float] = {}
+    nodes = {}
+    for ranking in rankings:
+        for rank, n in enumerate(ranking, 1):
+            scores[n.node.node_id] = scores.get(n.node.node_id, 0.0) + 1.0 / (k + rank)
+            nodes.setdefault(n.node.node_id, n.node)
+    best = sorted(scores.items(), key=lambda kv: -kv[1])[:top_k]
+    return [NodeWithScore(node=nodes[i], score=score) for i, score in best]
+
+def retrieve_context(query: str, token_budget: int = RAG_CONTEXT_TOKENS,
+                     retrieval: str = RAG_RETRIEVAL) -> tuple[str, list[dict]]:
+    """Retrieval only (at most one query embedding, no synthesis LLM call)."""
+    if retrieval == "hybrid":
+        nodes, confident = _lexical(query)
+        if not confident:
+            nodes = fuse(get_retriever().retrieve(query), nodes)
+        _count("bm25" if confident else "fused")
+        return build_context(nodes, token_budget, "bm25" if confident else "rrf")
+    nodes = get_retriever().retrieve(query)
+    _count("vector")
+    return build_context(nodes, token_budget)
+
+_SEMANTIC = SemanticCache()
+
+def semantic_cache_stats() -> dict:
+    return _SEMANTIC.metrics()
+
+def _answer(bundle: QueryBundle, nodes: list[NodeWithScore], mode: str, score_label: str) -> str:
+    if mode == "retrieve":
+        return build_context(nodes, score_label=score_label)[0]
+    resp = get_query_engine().synthesize(bundle, nodes)
+    return getattr(resp, "response", str(resp))
+
+def rag_context(query: str, mode: str = RAG_MODE, retrieval: str = RAG_RETRIEVAL) -> str:
+    """
+    Text that rag_node injects: the synthesized answer ("synthesize") or the
+    retrieved passages ("retrieve"). Near-identical repeat queries are answered
+    from the semantic cache; on a miss the query embedding is reused for retrieval.
+    With retrieval="hybrid", a confident BM25 match answers before any embedding.
+    """
+    bundle = QueryBundle(query)
+    lexical = None
+    if retrieval == "hybrid":
+        lexical, confident = _lexical(query)
+        if confident:
+            _count("bm25")
+            with telemetry.span(f"rag.{mode}", retrieval="bm25"):
+                return _answer(bundle, lexical, mode, "bm25")
+
+    version = None
+    if SEMANTIC_CACHE:
+        bundle.embedding = Settings.embed_model.get_query_embedding(query)
+        version = get_index_version()
+        hit = _SEMANTIC.lookup(bundle.embedding, mode, version)
+        telemetry.event("cache", cache="semantic", result="miss" if hit is None else "hit")
+        if hit is not None:
+            return hit
+
+    with telemetry.span(f"rag.{mode}", retrieval="fused" if lexical is not None else "vector"):
+        if lexical is not None:
+            text = _answer(bundle, fuse(get_retriever().retrieve(bundle), lexical), mode, "rrf")
+            _count("fused")
+        elif mode == "retrieve":
+            text, _ = build_context(get_retriever().retrieve(bundle))
+            _count("vector")
+        else:
+            resp = get_query_engine().query(bundle)
+            text = getattr(resp, "response", str(resp))
+            _count("vector")
+
+    if SEMANTIC_CACHE:
+        _SEMANTIC.add(bundle.embedding, mode, version, text)
+    return text
@@ -0,0 +1,64 @@
+# app/rag/embed_cache.py
+import hashlib, os, sqlite3, threading
+from pathlib import Path
+import numpy as np
+from ..config import CACHE_DIR
+
+class EmbeddingCache:
+    """
+    Persistent chunk-embedding cache in one SQLite file, keyed by
+    sha256(model name + chunk text). Survives index rebuilds, so unchanged
+    text is never re-embedded. Vectors are stored as float32 blobs.
+    """
+
+    def __init__(self, path: Path = CACHE_DIR / "embeddings.sqlite"):
+        self.path = Path(path)
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "writes": 0}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.path.parent, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS emb (key TEXT PRIMARY KEY, vec BLOB NOT NULL)")
+        return self._conn
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: list[str]) -> list[list[float] | None]:
+        keys = [self.key(model, t) for t in texts]
+        found: dict[str, bytes] = {}
+        with self._lock:
+            db = self._db()
+            for i in range(0, len(keys), 500):  # stay under SQLite's bound-parameter limit
+                chunk = keys[i:i + 500]
+                rows = db.execute(
+                    f"SELECT key, vec FROM emb WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update(rows)
+            out = [np.frombuffer(found[k], dtype=np.float32).tolist() if k in found else None for k in keys]
+            self.stats["hits"] += len(found)
+            self.stats["misses"] += len(keys) - len(found)
+        return out
+
+    def put_many(self, model: str, texts: list[str], vectors: list[list[float]]):
+        rows = [(self.key(model, t), np.asarray(v, dtype=np.float32).tobytes()) for t, v in zip(texts, vectors)]
+        with self._lock:
+            db = self._db()
+            with db:
+                db.executemany("INSERT OR REPLACE INTO emb (key, vec) VALUES (?, ?)", rows)
+            self.stats["writes"] += len(rows)
+
+_CACHE: EmbeddingCache | None = None
+_CACHE_LOCK = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = EmbeddingCache()
+        return _CACHE
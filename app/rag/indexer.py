@@ -1,69 +1,363 @@
 # app/rag/indexer.py
-import os, shutil
-from collections import defaultdict
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, Document
+import io, os, json, shutil, hashlib, multiprocessing, threading, time, weakref
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterator
+from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, Document, Settings
 from llama_index.core import StorageContext, load_index_from_storage
 from llama_index.core.node_parser import SentenceSplitter
-from ..config import DOC_DIR, INDEX_DIR
+from llama_index.core.schema import MetadataMode
+from ..config import DOC_DIR, INDEX_DIR, INDEX_PARSE_WORKERS, RAG_TOP_K
+from ..config import EMBED_CACHE, EMBED_BATCH_SIZE, EMBED_CONCURRENCY, INDEX_BATCH_SIZE
+from .embed_cache import get_embedding_cache
+from .vector_store import MmapVectorStore
+from .bm25 import BM25Index, bm25_path
+from .. import telemetry
 
-def _load_docs_safe(doc_dir: str):
-    """Load docs; return [] if dir exists but is empty (avoid ValueError)."""
+PLACEHOLDER_KEY = "EMPTY"
+_BUILD_LOCK = threading.Lock()
+_LAST_BUILD_STATS: dict = {}
+_BM25: "weakref.WeakKeyDictionary[VectorStoreIndex, BM25Index]" = weakref.WeakKeyDictionary()
+
+def _list_docs_safe(doc_dir: str) -> list[str]:
+    """List indexable files; return [] if dir exists but is empty (avoid ValueError)."""
     if not os.path.isdir(doc_dir):
         os.makedirs(doc_dir, exist_ok=True)
         return []
     try:
-        return SimpleDirectoryReader(doc_dir).load_data()
+        return [str(p) for p in SimpleDirectoryReader(doc_dir).input_files]
     except ValueError as e:
         # LlamaIndex raises ValueError("No files found in ...") on empty dirs
         if "No files found" in str(e):
             return []
         raise
 
-def build_or_load_index(doc_dir: str = str(DOC_DIR),
-                        index_dir: str = str(INDEX_DIR)) -> VectorStoreIndex:
-    # Try load existing index
-    if os.path.exists(index_dir):
+def _manifest_path(index_dir: str) -> str:
+    """The manifest lives next to index_store/, e.g. rag/index_store_manifest.json."""
+    index_dir = os.path.abspath(index_dir)
+    return os.path.join(os.path.dirname(index_dir), f"{os.path.basename(index_dir)}_manifest.json")
+
+def _load_manifest(index_dir: str) -> dict | None:
+    try:
+        with open(_manifest_path(index_dir), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        return manifest if isinstance(manifest.get("files"), dict) else None
+    except (OSError, ValueError):
+        return None
+
+def _save_manifest(index_dir: str, manifest: dict):
+    path = _manifest_path(index_dir)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)  # atomic: never leave a half-written manifest behind
+
+def manifest_version(manifest: dict | None) -> str:
+    """Content version of an index: changes whenever any file is added, changed or removed."""
+    files = (manifest or {}).get("files", {})
+    listing = sorted((fname, entry["sha256"]) for fname, entry in files.items())
+    return hashlib.sha256(json.dumps(listing).encode("utf-8")).hexdigest()[:16]
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _iter_pages(path: str) -> Iterator[str]:
+    """Yield a file's page texts one at a time; PDF pages are extracted lazily (same text as PDFReader)."""
+    if path.lower().endswith(".pdf"):
+        import pypdf
+        with open(path, "rb") as f:
+            for page in pypdf.PdfReader(f).pages:
+                yield page.extract_text()
+    else:
+        for doc in SimpleDirectoryReader(input_files=[path]).load_data():
+            yield doc.text
+
+def _parse_file(path: str) -> tuple[str, float]:
+    """Merge one file's pages into a single text without keeping the pages around."""
+    t0 = time.perf_counter()
+    buf = io.StringIO()
+    for i, page in enumerate(_iter_pages(path)):
+        if i:
+            buf.write("\n")
+        buf.write(page)
+    return buf.getvalue(), time.perf_counter() - t0
+
+_FILES_PER_PARSE_WORKER = 4
+
+def _iter_file_nodes(todo: list, splitter: SentenceSplitter, stats: dict):
+    """
+    Yield (todo item, nodes) one file at a time. Text extraction is CPU-bound
+    Python, so files are parsed in INDEX_PARSE_WORKERS processes, at most that
+    many ahead of the consumer; only the merged text comes back, and only a few
+    files' text is ever in memory. Splitting the whole merged file in this
+    process keeps chunks that span page boundaries identical to a one-shot build.
+    """
+    # A spawned worker pays a second or two of imports, so small syncs parse inline
+    workers = max(1, min(INDEX_PARSE_WORKERS, len(todo) // _FILES_PER_PARSE_WORKER))
+    # spawn, not fork: builds also run on the reindex thread of a multi-threaded server
+    ex = (ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+          if workers > 1 else None)
+    try:
+        items = iter(todo)
+        pending = deque()
+
+        def submit_next():
+            item = next(items, None)
+            if item is not None:
+                pending.append((item, ex.submit(_parse_file, item[1]) if ex else None))
+
+        for _ in range(workers):
+            submit_next()
+        while pending:
+            item, fut = pending.popleft()
+            text, parse_s = fut.result() if fut else _parse_file(item[1])
+            submit_next()
+            t0 = time.perf_counter()
+            doc = Document(text=text, metadata={"file_name": os.path.basename(item[1])})
+            del text
+            nodes = splitter.get_nodes_from_documents([doc])
+            del doc
+            stats["parse_s"] += parse_s
+            stats["split_s"] += time.perf_counter() - t0
+            stats["files_parsed"] += 1
+            stats["chunks"] += len(nodes)
+            yield item, nodes
+    finally:
+        if ex:
+            ex.shutdown(cancel_futures=True)
+
+def _embed_nodes(nodes, stats: dict):
+    """
+    Set node.embedding for every node: from the embedding cache where possible,
+    otherwise in EMBED_BATCH_SIZE batches with up to EMBED_CONCURRENCY calls in flight.
+    insert_nodes() then skips embedding for them.
+    """
+    model = Settings.embed_model
+    model_id = f"{type(model).__name__}:{getattr(model, 'model_name', '')}"
+    texts = [n.get_content(metadata_mode=MetadataMode.EMBED) for n in nodes]
+    cache = get_embedding_cache() if EMBED_CACHE else None
+    vectors = cache.get_many(model_id, texts) if cache else [None] * len(texts)
+    misses = [i for i, v in enumerate(vectors) if v is None]
+    batches = [misses[i:i + EMBED_BATCH_SIZE] for i in range(0, len(misses), EMBED_BATCH_SIZE)]
+
+    def embed(batch: list[int]):
+        out = model.get_text_embedding_batch([texts[i] for i in batch])
+        if cache:
+            cache.put_many(model_id, [texts[i] for i in batch], out)
+        return out
+
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(EMBED_CONCURRENCY, len(batches)), thread_name_prefix="embed") as ex:
+            for batch, out in zip(batches, ex.map(embed, batches)):
+                for i, vec in zip(batch, out):
+                    vectors[i] = vec
+    for node, vec in zip(nodes, vectors):
+        node.embedding = vec
+    stats["embed_cache_hits"] += len(nodes) - len(misses)
+    stats["embedded"] += len(misses)
+
+def _bm25_text(node) -> str:
+    return node.get_content(metadata_mode=MetadataMode.EMBED)  # the text that was embedded
+
+def _load_bm25(index: VectorStoreIndex, index_dir: str, manifest: dict) -> tuple[BM25Index, bool]:
+    """The persisted BM25 index if it covers exactly the manifest's chunks, else rebuilt from the docstore."""
+    expected = {i for entry in manifest["files"].values() for i in entry["node_ids"]}
+    expected.update(manifest.get(PLACEHOLDER_KEY) or [])
+    bm25 = BM25Index.load(bm25_path(index_dir))
+    if bm25 is not None and bm25.node_ids() == expected:
+        return bm25, False
+    bm25 = BM25Index()
+    docs = index.docstore.docs
+    bm25.add((i, _bm25_text(docs[i])) for i in expected if i in docs)  # no embedding calls
+    return bm25, True
+
+def _load_or_create(index_dir: str, manifest: dict | None) -> tuple[VectorStoreIndex, dict]:
+    # Try load existing index; an index without a manifest (e.g. one persisted before
+    # manifests existed) can't be diffed against doc_dir, so it is rebuilt in full
+    if os.path.exists(index_dir) and manifest is not None:
         try:
-            storage = StorageContext.from_defaults(persist_dir=index_dir)
-            return load_index_from_storage(storage)
+            storage = StorageContext.from_defaults(
+                persist_dir=index_dir, vector_store=MmapVectorStore.from_persist_dir(index_dir)
+            )
+            return load_index_from_storage(storage), manifest
         except Exception:
-            shutil.rmtree(index_dir, ignore_errors=True)  # rebuild cleanly
+            pass
+    shutil.rmtree(index_dir, ignore_errors=True)  # rebuild cleanly
+    storage = StorageContext.from_defaults(vector_store=MmapVectorStore())
+    return VectorStoreIndex(nodes=[], storage_context=storage), {"files": {}}
+
+def build_or_load_index(doc_dir: str = str(DOC_DIR),
+                        index_dir: str = str(INDEX_DIR),
+                        progress: Callable[[int, int], None] | None = None) -> VectorStoreIndex:
+    """
+    Load the persisted index and bring it in sync with doc_dir. Only added or
+    changed files are parsed and embedded; nodes of deleted files are removed.
+    progress(done, total) is called as changed files are indexed.
+    Timings of the last call are available from last_build_stats().
+    """
+    with _BUILD_LOCK:
+        t_start = time.perf_counter()
+        stats = {"files_parsed": 0, "chunks": 0, "parse_s": 0.0, "split_s": 0.0, "embed_s": 0.0,
+                 "embed_cache_hits": 0, "embedded": 0}
+        index, manifest = _load_or_create(index_dir, _load_manifest(index_dir))
+        bm25, bm25_dirty = _load_bm25(index, index_dir, manifest)
+        files = manifest["files"]
+        splitter = SentenceSplitter(chunk_size=1024, chunk_overlap=32)
+        dirty = not os.path.exists(index_dir)
 
-    # Fresh build
-    documents = _load_docs_safe(doc_dir)
+        on_disk = {os.path.basename(p): p for p in _list_docs_safe(doc_dir)}
 
-    if not documents:
-        # Build a tiny placeholder index so the app can run before docs arrive
-        placeholder = Document(text="(no RAG documents yet)", metadata={"file_name": "EMPTY"})
-        index = VectorStoreIndex.from_documents([placeholder])
-        index.storage_context.persist(persist_dir=index_dir)
+        # Deleted files
+        for fname in [f for f in files if f not in on_disk]:
+            node_ids = files.pop(fname)["node_ids"]
+            index.delete_nodes(node_ids, delete_from_docstore=True)
+            bm25.remove(node_ids)
+            dirty = True
+
+        # Added or changed files (mtime/size is the cheap check, the hash decides)
+        todo = []
+        for fname, path in sorted(on_disk.items()):
+            st = os.stat(path)
+            entry = files.get(fname)
+            if entry and entry["mtime"] == st.st_mtime and entry["size"] == st.st_size:
+                continue
+            digest = _file_sha256(path)
+            if entry and entry["sha256"] == digest:
+                entry.update(mtime=st.st_mtime, size=st.st_size)
+                dirty = True
+                continue
+            todo.append((fname, path, st, digest))
+
+        # Streamed: parse -> split -> embed + insert INDEX_BATCH_SIZE chunks at a time
+        if progress:
+            progress(0, len(todo))
+        for done, ((fname, _, st, digest), nodes) in enumerate(_iter_file_nodes(todo, splitter, stats), 1):
+            if fname in files:
+                index.delete_nodes(files[fname]["node_ids"], delete_from_docstore=True)
+                bm25.remove(files[fname]["node_ids"])
+            for i in range(0, len(nodes), INDEX_BATCH_SIZE):
+                batch = nodes[i:i + INDEX_BATCH_SIZE]
+                t0 = time.perf_counter()
+                _embed_nodes(batch, stats)
+                stats["embed_s"] += time.perf_counter() - t0
+                index.insert_nodes(batch)
+                bm25.add((n.node_id, _bm25_text(n)) for n in batch)
+                for n in batch:
+                    n.embedding = None  # the vector store has its own float32 copy now
+            files[fname] = {
+                "sha256": digest,
+                "mtime": st.st_mtime,
+                "size": st.st_size,
+                "node_ids": [n.node_id for n in nodes],
+            }
+            dirty = True
+            if progress:
+                progress(done, len(todo))
+
+        # Keep a tiny placeholder index so the app can run before docs arrive
+        placeholder = manifest.get(PLACEHOLDER_KEY)
+        if files and placeholder:
+            node_ids = manifest.pop(PLACEHOLDER_KEY)
+            index.delete_nodes(node_ids, delete_from_docstore=True)
+            bm25.remove(node_ids)
+            dirty = True
+        elif not files and not placeholder:
+            doc = Document(text="(no RAG documents yet)", metadata={"file_name": PLACEHOLDER_KEY})
+            nodes = splitter.get_nodes_from_documents([doc])
+            _embed_nodes(nodes, stats)
+            index.insert_nodes(nodes)
+            bm25.add((n.node_id, _bm25_text(n)) for n in nodes)
+            manifest[PLACEHOLDER_KEY] = [n.node_id for n in nodes]
+            dirty = True
+
+        if dirty:
+            index.storage_context.persist(persist_dir=index_dir)
+            _save_manifest(index_dir, manifest)
+        if dirty or bm25_dirty:
+            bm25.save(bm25_path(index_dir))
+        _BM25[index] = bm25
+        stats["total_s"] = time.perf_counter() - t_start
+        _LAST_BUILD_STATS.clear()
+        _LAST_BUILD_STATS.update({k: round(v, 4) if isinstance(v, float) else v for k, v in stats.items()})
         return index
 
-    # Merge pages by file
-    file_to_pages = defaultdict(list)
-    for d in documents:
-        fname = d.metadata.get("file_name") or d.metadata.get("filename") or "unknown_source"
-        file_to_pages[fname].append(d.text)
+def last_build_stats() -> dict:
+    """
+    Parse/split/embed times (summed over files; parsing overlaps across workers)
+    and embedding-cache hits of the last build_or_load_index call.
+    """
+    return dict(_LAST_BUILD_STATS)
+
+# --- lazy singletons (first rag_node call or warm-up pays the load) ---
+_index: VectorStoreIndex | None = None
+_index_version: str | None = None
+_query_engine = None
+_SINGLETON_LOCK = threading.Lock()
+
+def get_index() -> VectorStoreIndex:
+    global _index, _index_version
+    if _index is None:
+        with _SINGLETON_LOCK:
+            if _index is None:
+                with telemetry.span("index.load") as sp:
+                    _index = build_or_load_index()
+                    sp.set(**{k: v for k, v in last_build_stats().items() if k in ("files_parsed", "chunks", "embedded", "embed_cache_hits")})
+                _index_version = manifest_version(_load_manifest(str(INDEX_DIR)))
+    return _index
+
+def swap_index(index: VectorStoreIndex, index_dir: str = str(INDEX_DIR)):
+    """
+    Make `index` the live one (index, version and query engine change together).
+    Queries already running keep the engine they started with; the next
+    get_query_engine() / get_retriever() call gets the new one.
+    """
+    global _index, _index_version, _query_engine
+    version = manifest_version(_load_manifest(index_dir))
+    engine = index.as_query_engine(similarity_top_k=RAG_TOP_K)
+    with _SINGLETON_LOCK:
+        _index, _index_version, _query_engine = index, version, engine
 
-    merged_docs = [
-        Document(text="\n".join(pages), metadata={"file_name": fn})
-        for fn, pages in file_to_pages.items()
-    ]
+def get_bm25(index: VectorStoreIndex | None = None) -> BM25Index:
+    """The BM25 index kept in sync with `index` (default: the live one) by build_or_load_index."""
+    index = index or get_index()
+    bm25 = _BM25.get(index)
+    if bm25 is None:  # an index that didn't come from build_or_load_index
+        bm25 = BM25Index()
+        bm25.add((i, _bm25_text(n)) for i, n in index.docstore.docs.items())
+        _BM25[index] = bm25
+    return bm25
 
-    splitter = SentenceSplitter(chunk_size=1024, chunk_overlap=32)
-    nodes = splitter.get_nodes_from_documents(merged_docs)
+def get_index_version() -> str:
+    """Content version of the live index (see manifest_version); loads the index if needed."""
+    get_index()
+    return _index_version
 
-    index = VectorStoreIndex(nodes)
-    index.storage_context.persist(persist_dir=index_dir)
-    return index
+def get_query_engine():
+    global _query_engine
+    if _query_engine is None:
+        index = get_index()
+        with _SINGLETON_LOCK:
+            if _query_engine is None:
+                _query_engine = index.as_query_engine(similarity_top_k=RAG_TOP_K)
+    return _query_engine
 
-# --- singletons ---
-_INDEX = build_or_load_index()
-QUERY_ENGINE = _INDEX.as_query_engine(similarity_top_k=5)
+def __getattr__(name: str):
+    # Backwards compat for `from app.rag.indexer import QUERY_ENGINE` / `_INDEX`
+    if name == "QUERY_ENGINE":
+        return get_query_engine()
+    if name == "_INDEX":
+        return get_index()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def format_sources(resp):
+    """Accepts a query response or a plain list of retrieved nodes."""
     out = []
-    for n in getattr(resp, "source_nodes", []) or []:
+    nodes = resp if isinstance(resp, list) else getattr(resp, "source_nodes", [])
+    for n in nodes or []:
         out.append({
             "file": n.metadata.get("file_name", "unknown"),
             "score": getattr(n, "score", None),
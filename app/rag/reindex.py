@@ -0,0 +1,67 @@
+# app/rag/reindex.py
+import queue, threading, time
+from ..config import DOC_DIR, INDEX_DIR
+from .. import telemetry
+
+_JOBS: queue.Queue = queue.Queue()
+_STATUS = {"state": "idle", "done": 0, "total": 0, "version": None,
+           "error": None, "stats": {}, "finished_at": None, "last_job": 0}
+_STATUS_LOCK = threading.Lock()
+_next_job = 0
+_worker: threading.Thread | None = None
+_WORKER_LOCK = threading.Lock()
+
+def _set(**kw):
+    with _STATUS_LOCK:
+        _STATUS.update(kw)
+
+def _run():
+    from . import indexer
+    while True:
+        job, doc_dir, index_dir = _JOBS.get()
+        # Uploads arrive in bursts: jobs queued meanwhile are covered by this build
+        while True:
+            try:
+                job, doc_dir, index_dir = _JOBS.get_nowait()
+            except queue.Empty:
+                break
+        _set(state="indexing", done=0, total=0, error=None)
+        try:
+            with telemetry.span("index.rebuild", job=job) as sp:
+                index = indexer.build_or_load_index(doc_dir, index_dir,
+                                                    progress=lambda done, total: _set(done=done, total=total))
+                stats = indexer.last_build_stats()
+                sp.set(**{k: v for k, v in stats.items() if k in ("files_parsed", "chunks", "embedded")})
+            indexer.swap_index(index, index_dir)
+            _set(state="ready", version=indexer.get_index_version(), stats=stats)
+        except Exception as e:  # keep serving the previous index
+            _set(state="error", error=f"{type(e).__name__}: {e}")
+        _set(finished_at=time.time(), last_job=job)
+
+def request_reindex(doc_dir: str = str(DOC_DIR), index_dir: str = str(INDEX_DIR)) -> int:
+    """
+    Queue a sync of the index with doc_dir and return at once with a job id.
+    One daemon thread builds; when it finishes the new index replaces the live
+    one (swap_index) and reindex_status()["last_job"] reaches the id.
+    """
+    global _next_job, _worker
+    with _WORKER_LOCK:
+        if _worker is None:
+            _worker = threading.Thread(target=_run, name="reindex", daemon=True)
+            _worker.start()
+        _next_job += 1
+        job = _next_job
+    _JOBS.put((job, doc_dir, index_dir))
+    return job
+
+def reindex_status() -> dict:
+    """
+    state: idle | queued | indexing | ready | error (the previous index stays live);
+    done/total count the changed files of the running build, queued the jobs waiting.
+    """
+    with _STATUS_LOCK:
+        status = dict(_STATUS)
+    status["queued"] = _JOBS.qsize()
+    if status["queued"] and status["state"] != "indexing":
+        status["state"] = "queued"
+    return status
@@ -0,0 +1,78 @@
+# app/rag/semantic_cache.py
+import threading
+from collections import OrderedDict
+import numpy as np
+from ..config import (
+    SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_ENTRIES, SEMANTIC_CACHE_MB,
+)
+
+class SemanticCache:
+    """
+    Query-embedding -> RAG context cache. A lookup hits when the best cosine
+    similarity among entries of the same mode is >= threshold. All entries
+    belong to one index version; a different version clears the cache.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = SEMANTIC_CACHE_ENTRIES,
+                 max_bytes: int = SEMANTIC_CACHE_MB * 1024 * 1024):
+        self.threshold, self.max_entries, self.max_bytes = threshold, max_entries, max_bytes
+        self._entries: OrderedDict[int, tuple[str, np.ndarray, str]] = OrderedDict()  # id -> (mode, emb, ctx)
+        self._next_id = 0
+        self._bytes = 0
+        self._version: str | None = None
+        self._matrix = None  # (ids, modes, stacked embeddings), rebuilt after changes
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        v = np.asarray(embedding, dtype=np.float32)
+        return v / (np.linalg.norm(v) or 1.0)
+
+    def _check_version(self, version: str):
+        if version != self._version:
+            if self._entries:
+                self.stats["invalidations"] += 1
+            self._entries.clear()
+            self._bytes, self._matrix, self._version = 0, None, version
+
+    def lookup(self, embedding, mode: str, version: str) -> str | None:
+        q = self._normalize(embedding)
+        with self._lock:
+            self._check_version(version)
+            if self._matrix is None and self._entries:
+                ids = list(self._entries)
+                self._matrix = (ids, np.array([self._entries[i][0] for i in ids]),
+                                np.stack([self._entries[i][1] for i in ids]))
+            if self._matrix is not None:
+                ids, modes, mat = self._matrix
+                if mat.shape[1] == q.shape[0]:
+                    sims = np.where(modes == mode, mat @ q, -1.0)
+                    best = int(np.argmax(sims))
+                    if sims[best] >= self.threshold:
+                        self._entries.move_to_end(ids[best])  # LRU; matrix order doesn't matter
+                        self.stats["hits"] += 1
+                        return self._entries[ids[best]][2]
+            self.stats["misses"] += 1
+            return None
+
+    def add(self, embedding, mode: str, version: str, ctx: str):
+        v = self._normalize(embedding)
+        size = v.nbytes + len(ctx.encode("utf-8"))
+        with self._lock:
+            self._check_version(version)
+            self._entries[self._next_id] = (mode, v, ctx)
+            self._next_id += 1
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, ev, ectx) = self._entries.popitem(last=False)
+                self._bytes -= ev.nbytes + len(ectx.encode("utf-8"))
+                self.stats["evictions"] += 1
+            self._matrix = None
+
+    def metrics(self) -> dict:
+        with self._lock:
+            total = self.stats["hits"] + self.stats["misses"]
+            return {**self.stats, "entries": len(self._entries), "bytes": self._bytes,
+                    "hit_rate": round(self.stats["hits"] / total, 4) if total else 0.0}
@@ -0,0 +1,146 @@
+# app/rag/vector_store.py
+import os
+from typing import Any, List, Optional, Sequence
+import numpy as np
+from pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore, VectorStoreQuery, VectorStoreQueryMode, VectorStoreQueryResult,
+)
+
+def _npy_paths(persist_path: str) -> tuple[str, str, str]:
+    """default__vector_store.json -> default__vector_store.{npy,ids.npy,refs.npy}"""
+    base = os.path.splitext(persist_path)[0]
+    return f"{base}.npy", f"{base}.ids.npy", f"{base}.refs.npy"
+
+def _save_npy(path: str, arr: np.ndarray):
+    tmp = path + ".tmp.npy"
+    np.save(tmp, arr, allow_pickle=False)
+    os.replace(tmp, path)  # readers keep their old mmap'd pages until they reload
+
+class MmapVectorStore(BasePydanticVectorStore):
+    """
+    Vector store backed by a contiguous float32 .npy matrix opened with mmap.
+    Rows are L2-normalized so top-k is one mat-vec product + argpartition.
+    Node IDs and ref doc IDs live in compact byte-string side arrays.
+    """
+
+    stores_text: bool = False
+    # (embeddings [N, D] float32, node_ids [N] bytes, ref_doc_ids [N] bytes), swapped as one tuple
+    _data: tuple = PrivateAttr()
+    # Growable backing array while adding: _data[0] is a view of its first N rows, so a
+    # build that adds in many batches appends in place instead of re-copying the matrix
+    _buf: Optional[np.ndarray] = PrivateAttr(default=None)
+
+    def __init__(self, embeddings: Optional[np.ndarray] = None,
+                 node_ids: Optional[np.ndarray] = None,
+                 ref_doc_ids: Optional[np.ndarray] = None, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        if embeddings is None:
+            embeddings = np.zeros((0, 0), dtype=np.float32)
+            node_ids = np.zeros(0, dtype="S1")
+            ref_doc_ids = np.zeros(0, dtype="S1")
+        self._data = (embeddings, node_ids, ref_doc_ids)
+        self._buf = None
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MmapVectorStore"
+
+    @classmethod
+    def from_persist_path(cls, persist_path: str) -> "MmapVectorStore":
+        emb_path, ids_path, refs_path = _npy_paths(persist_path)
+        if not os.path.exists(emb_path):
+            raise ValueError(f"No mmap vector store found at {emb_path}")
+        emb = np.load(emb_path, mmap_mode="r")
+        return cls(emb, np.load(ids_path), np.load(refs_path))
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: str, namespace: str = "default") -> "MmapVectorStore":
+        return cls.from_persist_path(os.path.join(persist_dir, f"{namespace}__vector_store.json"))
+
+    @property
+    def client(self) -> None:
+        return None
+
+    def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        new = np.asarray([n.get_embedding() for n in nodes], dtype=np.float32)
+        norms = np.linalg.norm(new, axis=1, keepdims=True)
+        new /= np.where(norms == 0, 1.0, norms)
+        ids = np.array([n.node_id for n in nodes], dtype="S")
+        refs = np.array([n.ref_doc_id or "None" for n in nodes], dtype="S")
+
+        emb, old_ids, old_refs = self._data
+        rows, k = len(old_ids), len(new)
+        if rows:
+            buf = self._buf
+            if buf is None or len(buf) < rows + k:
+                # Copies the mmap'd rows into RAM once, with room for later batches
+                buf = np.empty((rows + max(k, rows // 2), emb.shape[1]), dtype=np.float32)
+                buf[:rows] = emb
+            buf[rows:rows + k] = new  # rows past `rows` are invisible to readers of the old view
+            self._buf, new = buf, buf[:rows + k]
+            ids = np.concatenate([old_ids, ids])
+            refs = np.concatenate([old_refs, refs])
+        self._data = (new, ids, refs)
+        return [n.node_id for n in nodes]
+
+    def _keep(self, mask: np.ndarray):
+        emb, ids, refs = self._data
+        if mask.all():
+            return
+        self._data = (np.ascontiguousarray(emb[mask]), ids[mask], refs[mask])
+        self._buf = None
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        refs = self._data[2]
+        self._keep(refs != ref_doc_id.encode())
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, filters: Any = None,
+                     **delete_kwargs: Any) -> None:
+        if filters is not None:
+            raise ValueError("MmapVectorStore does not store metadata; filters are unsupported.")
+        if node_ids is None:
+            return
+        ids = self._data[1]
+        self._keep(~np.isin(ids, np.array(node_ids, dtype="S")))
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.filters is not None:
+            raise ValueError("MmapVectorStore does not store metadata; filters are unsupported.")
+        if query.mode != VectorStoreQueryMode.DEFAULT:
+            raise ValueError(f"Invalid query mode: {query.mode}")
+
+        emb, ids, _ = self._data  # one snapshot, safe against a concurrent add/delete
+        if query.node_ids is not None:
+            mask = np.isin(ids, np.array(query.node_ids, dtype="S"))
+            emb, ids = emb[mask], ids[mask]
+        if not len(ids):
+            return VectorStoreQueryResult(similarities=[], ids=[])
+
+        q = np.array(query.query_embedding, dtype=np.float32)
+        q /= np.linalg.norm(q) or 1.0
+        sims = emb @ q
+        k = min(query.similarity_top_k, len(sims))
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return VectorStoreQueryResult(
+            similarities=sims[top].tolist(),
+            ids=[i.decode() for i in ids[top]],
+        )
+
+    def persist(self, persist_path: str, fs: Any = None) -> None:
+        emb, ids, refs = self._data
+        emb_path, ids_path, refs_path = _npy_paths(persist_path)
+        os.makedirs(os.path.dirname(emb_path), exist_ok=True)
+        _save_npy(ids_path, ids)
+        _save_npy(refs_path, refs)
+        _save_npy(emb_path, np.ascontiguousarray(emb, dtype=np.float32))
+        # Re-open what we just wrote so resident memory drops back to shared pages
+        self._data = (np.load(emb_path, mmap_mode="r"), ids, refs)
+        self._buf = None
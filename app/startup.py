@@ -0,0 +1,104 @@
+# app/startup.py
+import importlib, sys, threading, time
+from typing import Callable
+
+def _warm_rag():
+    from app import rag
+    rag.get_query_engine()
+
+def _warm_ocr():
+    from app.tools import ocr_tool
+    ocr_tool.warm_up()
+
+def _warm_obj_detect():
+    from app.tools import obj_detect_tool
+    obj_detect_tool.warm_up()
+
+# component -> loader; also the order used by warm_up()
+WARMERS: dict[str, Callable[[], None]] = {
+    "rag": _warm_rag,
+    "ocr": _warm_ocr,
+    "obj_detect": _warm_obj_detect,
+}
+
+_warm_thread: threading.Thread | None = None
+_warm_errors: dict[str, str] = {}
+
+def warm_up(components=tuple(WARMERS), background: bool = True) -> threading.Thread | None:
+    """
+    Load the RAG index and heavy tool models ahead of the first request.
+    With background=True this runs once per process in a daemon thread.
+    """
+    global _warm_thread
+
+    def run():
+        for name in components:
+            try:
+                WARMERS[name]()
+            except Exception as e:  # a failed warm-up just means the first call loads it
+                _warm_errors[name] = str(e)
+
+    if not background:
+        run()
+        return None
+    if _warm_thread is None:
+        _warm_thread = threading.Thread(target=run, name="warm-up", daemon=True)
+        _warm_thread.start()
+    return _warm_thread
+
+def _timed(fn: Callable[[], object]) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+def _import(*modules: str) -> Callable[[], None]:
+    return lambda: [importlib.import_module(m) for m in modules]
+
+def profile_startup(include_models: bool = True) -> list[tuple[str, float]]:
+    """
+    Time imports and initialization per component, in dependency order.
+    Modules already imported before the call report ~0s.
+    """
+    steps = [
+        ("import app.config (dotenv, paths)", _import("app.config")),
+        ("import langgraph + langchain_openai", _import("langgraph.graph", "langchain_openai")),
+        ("import app.graph", _import("app.graph")),
+        ("build graph", lambda: sys.modules["app.graph"].build_graph()),
+        ("import llama_index (app.rag.indexer)", _import("app.rag.indexer")),
+        ("load/sync RAG index + query engine", _warm_rag),
+    ]
+    if include_models:
+        steps += [
+            ("import rapidocr_onnxruntime", _import("rapidocr_onnxruntime")),
+            ("init RapidOCR engine", _warm_ocr),
+            ("import torch + transformers", _import("torch", "transformers")),
+            ("load DETR model", _warm_obj_detect),
+        ]
+    rows = []
+    for name, fn in steps:
+        try:
+            rows.append((name, _timed(fn)))
+        except Exception as e:
+            rows.append((f"{name} [failed: {type(e).__name__}]", float("nan")))
+        if fn is _warm_rag:
+            rows += _index_build_rows()
+    return rows
+
+def _index_build_rows() -> list[tuple[str, float]]:
+    """Breakdown of the index sync, shown indented (already included in its parent row)."""
+    indexer = sys.modules.get("app.rag.indexer")
+    stats = indexer.last_build_stats() if indexer else {}
+    if not stats.get("files_parsed"):
+        return []
+    return [
+        (f"  parse {stats['files_parsed']} file(s)", stats["parse_s"]),
+        (f"  split into {stats['chunks']} chunks", stats["split_s"]),
+        (f"  embed ({stats['embed_cache_hits']} cached, {stats['embedded']} new)", stats["embed_s"]),
+    ]
+
+def format_report(rows: list[tuple[str, float]]) -> str:
+    width = max(len(name) for name, _ in rows)
+    lines = [f"{name:<{width}}  {secs:8.3f}s" for name, secs in rows]
+    total = sum(secs for name, secs in rows if secs == secs and not name.startswith("  "))  # skip NaN + sub-rows
+    lines.append(f"{'total':<{width}}  {total:8.3f}s")
+    return "\n".join(lines)
@@ -0,0 +1,56 @@
+# app/streaming.py
+import queue
+from typing import Any, AsyncIterator, Iterator
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+# Events yielded to the CLI / Streamlit:
+#   {"event": "token", "text": str}                        agent tokens as they arrive
+#   {"event": "tool_start", "name", "id", "args"}          a tool call was dispatched
+#   {"event": "tool_end", "name", "id", "ok"}              that tool call finished
+#   {"event": "final", "message": AIMessage, "messages": [...]}   end of turn
+
+async def astream_turn(graph, inputs: dict, config: dict) -> AsyncIterator[dict[str, Any]]:
+    """Run one turn on the async path (graph.astream) and yield UI events."""
+    async for mode, data in graph.astream(inputs, config, stream_mode=["messages", "custom"]):
+        if mode == "messages":
+            chunk, meta = data
+            if (isinstance(chunk, AIMessageChunk) and meta.get("langgraph_node") == "agent"
+                    and isinstance(chunk.content, str) and chunk.content):
+                yield {"event": "token", "text": chunk.content}
+        elif mode == "custom" and isinstance(data, dict) and "event" in data:
+            yield data
+    state = await graph.aget_state(config)
+    messages = state.values.get("messages", [])
+    final = messages[-1] if messages else AIMessage(content="")
+    yield {"event": "final", "message": final, "messages": messages}
+
+async def arun_turn(graph, inputs: dict, config: dict) -> dict:
+    """Non-streaming async turn (graph.ainvoke); many of these can share one event loop."""
+    return await graph.ainvoke(inputs, config)
+
+_DONE = object()
+
+def iter_turn(graph, inputs: dict, config: dict) -> Iterator[dict[str, Any]]:
+    """
+    Sync view of astream_turn for callers without an event loop (Streamlit).
+    The async stream runs on the shared LLM event loop, so every turn reuses
+    one async connection pool.
+    """
+    from app.llm import submit
+    q: queue.Queue = queue.Queue()
+
+    async def pump():
+        try:
+            async for ev in astream_turn(graph, inputs, config):
+                q.put(ev)
+        except BaseException as e:
+            q.put(e)
+        finally:
+            q.put(_DONE)
+
+    fut = submit(pump())
+    while (item := q.get()) is not _DONE:
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+    fut.result()
@@ -0,0 +1,247 @@
+# app/telemetry.py
+import contextvars, json, logging, os, threading, time, uuid
+from bisect import bisect_left
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+from app.config import TRACE, TRACE_DIR, METRICS_PORT, METRICS_HOST
+
+logger = logging.getLogger(__name__)
+
+# Checked first by every helper below, so disabled instrumentation costs one global lookup
+ENABLED = TRACE or METRICS_PORT > 0
+
+# (trace_id, thread_id, parent span_id) of the code currently running; bind() carries it into worker threads
+_CTX: contextvars.ContextVar[tuple[str, str, str] | None] = contextvars.ContextVar("telemetry_ctx", default=None)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(10))  # 1 KiB .. 256 MiB
+
+class _Metrics:
+    """Minimal Prometheus registry: labelled counters and cumulative histograms, text exposition format."""
+
+    def __init__(self):
+        self._counters: dict[tuple[str, tuple], float] = {}
+        self._hists: dict[tuple[str, tuple], list] = {}  # key -> [bucket counts..., sum, count]
+        self._buckets: dict[str, tuple] = {}
+        self._help: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, labels: dict, value: float = 1.0, help: str = ""):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, help)
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, labels: dict, value: float, buckets: tuple, help: str = ""):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, help)
+            self._buckets.setdefault(name, buckets)
+            h = self._hists.get(key)
+            if h is None:
+                h = self._hists[key] = [0] * (len(buckets) + 2)
+            i = bisect_left(buckets, value)
+            if i < len(buckets):
+                h[i] += 1
+            h[-2] += value
+            h[-1] += 1
+
+    @staticmethod
+    def _labels(pairs) -> str:
+        if not pairs:
+            return ""
+        esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+    def render(self) -> str:
+        lines, typed = [], set()
+        with self._lock:
+            for (name, pairs), value in sorted(self._counters.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines += [f"# HELP {name} {self._help.get(name) or name}", f"# TYPE {name} counter"]
+                lines.append(f"{name}{self._labels(pairs)} {value:g}")
+            for (name, pairs), h in sorted(self._hists.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines += [f"# HELP {name} {self._help.get(name) or name}", f"# TYPE {name} histogram"]
+                cumulative = 0
+                for bound, n in zip(self._buckets[name], h):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{self._labels(pairs + (('le', f'{bound:g}'),))} {cumulative}")
+                lines.append(f"{name}_bucket{self._labels(pairs + (('le', '+Inf'),))} {h[-1]}")
+                lines.append(f"{name}_sum{self._labels(pairs)} {h[-2]:g}")
+                lines.append(f"{name}_count{self._labels(pairs)} {h[-1]}")
+        return "\n".join(lines) + "\n"
+
+METRICS = _Metrics()
+
+class _TraceWriter:
+    """Appends JSON lines to TRACE_DIR/trace-YYYYMMDD.jsonl (one file per day, shared by processes)."""
+
+    def __init__(self, root=TRACE_DIR):
+        self.root = root
+        self._day, self._f = None, None
+        self._lock = threading.Lock()
+
+    def write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        day = time.strftime("%Y%m%d", time.localtime(record["ts"]))
+        with self._lock:
+            if day != self._day:
+                if self._f:
+                    self._f.close()
+                os.makedirs(self.root, exist_ok=True)
+                self._f = open(os.path.join(self.root, f"trace-{day}.jsonl"), "a", encoding="utf-8", buffering=1)
+                self._day = day
+            self._f.write(line)
+
+_WRITER = _TraceWriter() if TRACE else None
+
+class _Span:
+    __slots__ = ("name", "attrs", "span_id", "_t0", "_token")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name, self.attrs = name, attrs
+
+    def set(self, **attrs):
+        """Attach attributes known only once the work is done (sizes, hit/miss, ...)."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        ctx = _CTX.get() or ("", "", "")
+        self.span_id = uuid.uuid4().hex[:16]
+        self._token = _CTX.set((ctx[0], ctx[1], self.span_id))
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        dur = time.perf_counter() - self._t0
+        _CTX.reset(self._token)
+        ok = exc_type is None and self.attrs.get("ok", True)
+        if METRICS_PORT:
+            METRICS.observe("agent_span_seconds", {"span": self.name}, dur, SECONDS_BUCKETS,
+                            "Duration of graph nodes, tool calls, image and model loads")
+            if not ok:
+                METRICS.inc("agent_span_errors_total", {"span": self.name}, help="Spans that raised or returned an error")
+        if _WRITER:
+            trace_id, thread_id, parent = _CTX.get() or ("", "", "")
+            record = {"ts": time.time() - dur, "type": "span", "name": self.name, "trace_id": trace_id,
+                      "thread_id": thread_id, "span_id": self.span_id, "parent_id": parent,
+                      "dur_ms": round(dur * 1000, 3), **self.attrs}
+            if exc_type is not None:
+                record["ok"], record["error"] = False, f"{exc_type.__name__}: {exc}"
+            _WRITER.write(record)
+        return False
+
+class _NoopSpan:
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NOOP = _NoopSpan()
+
+def span(name: str, **attrs):
+    """Time a block: `with span("tool.ocr") as sp: ...; sp.set(output_bytes=n)`."""
+    return _Span(name, attrs) if ENABLED else _NOOP
+
+def event(name: str, **labels):
+    """Count a point event (cache hit/miss, ...); labels must be low-cardinality strings."""
+    if not ENABLED:
+        return
+    if METRICS_PORT:
+        METRICS.inc("agent_events_total", {"event": name, **labels}, help="Cache lookups and other point events")
+    if _WRITER:
+        trace_id, thread_id, parent = _CTX.get() or ("", "", "")
+        _WRITER.write({"ts": time.time(), "type": "event", "name": name, "trace_id": trace_id,
+                       "thread_id": thread_id, "parent_id": parent, **labels})
+
+def payload(kind: str, nbytes: int):
+    """Record a payload size (prompt, tool output, image) in the agent_payload_bytes histogram."""
+    if METRICS_PORT:
+        METRICS.observe("agent_payload_bytes", {"kind": kind}, nbytes, BYTES_BUCKETS,
+                        "Sizes of prompts, tool outputs and images")
+
+def llm_tokens(model: str, usage: dict | None):
+    """Count input/output tokens from a LangChain usage_metadata dict."""
+    if not ENABLED or not usage:
+        return
+    for kind in ("input", "output"):
+        n = usage.get(f"{kind}_tokens") or 0
+        if METRICS_PORT:
+            METRICS.inc("agent_llm_tokens_total", {"model": model, "kind": kind}, n, "LLM tokens by model and direction")
+    if _WRITER:
+        trace_id, thread_id, parent = _CTX.get() or ("", "", "")
+        _WRITER.write({"ts": time.time(), "type": "event", "name": "llm_usage", "model": model, "trace_id": trace_id,
+                       "thread_id": thread_id, "parent_id": parent,
+                       "input_tokens": usage.get("input_tokens") or 0, "output_tokens": usage.get("output_tokens") or 0})
+
+def start_trace() -> str:
+    """New trace id for one user turn; rag_node starts it and keeps it in the graph state."""
+    return uuid.uuid4().hex if ENABLED else ""
+
+class use_trace:
+    """Make trace_id / thread_id current for the spans and events inside the block."""
+
+    __slots__ = ("ctx", "_token")
+
+    def __init__(self, trace_id: str | None, thread_id: str | None = None):
+        self.ctx = (trace_id or "", thread_id or "", "")
+
+    def __enter__(self):
+        self._token = _CTX.set(self.ctx) if ENABLED else None
+        return self
+
+    def __exit__(self, *exc):
+        if self._token is not None:
+            _CTX.reset(self._token)
+        return False
+
+def bind(fn: Callable) -> Callable:
+    """fn running with the caller's trace context, for handing work to thread pools."""
+    if not ENABLED:
+        return fn
+    ctx = contextvars.copy_context()
+    @wraps(fn)
+    def run(*args, **kwargs):
+        return ctx.copy().run(fn, *args, **kwargs)  # copy: a context can't be entered by two threads
+    return run
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = METRICS.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # scrapes every few seconds would flood stderr
+
+_SERVER: ThreadingHTTPServer | None = None
+_SERVER_LOCK = threading.Lock()
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = METRICS_HOST) -> ThreadingHTTPServer | None:
+    """Serve /metrics from a daemon thread; once per process, no-op when METRICS_PORT is 0."""
+    global _SERVER
+    if not port:
+        return None
+    with _SERVER_LOCK:
+        if _SERVER is None:
+            try:
+                _SERVER = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:  # e.g. another process (a second Streamlit worker) already serves it
+                logger.warning("metrics endpoint not started on %s:%s: %s", host, port, e)
+                return None
+            threading.Thread(target=_SERVER.serve_forever, name="metrics", daemon=True).start()
+        return _SERVER
@@ -1,5 +1,5 @@
 from .tavily_tool import tavily_search
-from .ocr_tool import ocr
+from .ocr_tool import ocr, ocr_batch
 from .obj_detect_tool import obj_detect
 
-__all__ = ["tavily_search", "ocr", "obj_detect"]
+__all__ = ["tavily_search", "ocr", "ocr_batch", "obj_detect"]
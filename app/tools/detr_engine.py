@@ -0,0 +1,166 @@
+# app/tools/detr_engine.py
+import os, queue, threading, time
+from concurrent.futures import Future
+from PIL import Image
+from app.config import DETR_BACKEND, DETR_MAX_BATCH, DETR_BATCH_WAIT_MS, MODEL_DIR
+from app import telemetry
+
+BACKENDS = ("torch", "int8", "onnx")
+
+class DetrEngine:
+    """
+    One loaded DETR model + processor on CPU. detect() goes through a
+    micro-batching queue so concurrent callers share one forward pass.
+    torch/transformers are imported here, never at tool import time.
+    """
+
+    def __init__(self, model_name: str, revision: str, backend: str = "torch",
+                 max_batch: int = DETR_MAX_BATCH, wait_ms: int = DETR_BATCH_WAIT_MS,
+                 model=None, processor=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"unknown DETR backend {backend!r} (expected one of {BACKENDS})")
+        import torch
+        from transformers import DetrImageProcessor, DetrForObjectDetection
+        self.model_name, self.revision, self.backend = model_name, revision, backend
+        self.max_batch, self.wait_s = max(1, max_batch), wait_ms / 1000.0
+        self.proc = processor or DetrImageProcessor.from_pretrained(model_name, revision=revision)
+        model = model or DetrForObjectDetection.from_pretrained(model_name, revision=revision)
+        model = model.eval()
+        self.id2label = model.config.id2label
+
+        self._session = None
+        if backend == "int8":
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif backend == "onnx":
+            self._session = self._onnx_session(model)
+        self.model = model
+
+        self._queue: queue.Queue = queue.Queue()
+        self._worker: threading.Thread | None = None
+        self._worker_lock = threading.Lock()
+
+    # --- backends ---
+    def _onnx_path(self) -> str:
+        safe = self.model_name.replace("/", "__")
+        return os.path.join(str(MODEL_DIR), f"{safe}@{self.revision}.onnx")
+
+    def _onnx_session(self, model):
+        import torch
+        import onnxruntime as ort
+        path = self._onnx_path()
+        if not os.path.exists(path):
+            # Export once; later processes reuse the file
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            dummy = (torch.zeros(1, 3, 800, 800), torch.ones(1, 800, 800, dtype=torch.long))
+            tmp = path + ".tmp"
+            torch.onnx.export(
+                model, dummy, tmp, dynamo=False, opset_version=17,
+                input_names=["pixel_values", "pixel_mask"], output_names=["logits", "pred_boxes"],
+                dynamic_axes={"pixel_values": {0: "batch", 2: "height", 3: "width"},
+                              "pixel_mask": {0: "batch", 1: "height", 2: "width"},
+                              "logits": {0: "batch"}, "pred_boxes": {0: "batch"}},
+            )
+            os.replace(tmp, path)
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+
+    def _forward(self, images: list[Image.Image]):
+        import torch
+        from transformers.models.detr.modeling_detr import DetrObjectDetectionOutput
+        inputs = self.proc(images=images, return_tensors="pt")
+        if self._session is not None:
+            logits, boxes = self._session.run(["logits", "pred_boxes"], {
+                "pixel_values": inputs["pixel_values"].numpy(),
+                "pixel_mask": inputs["pixel_mask"].numpy().astype("int64"),
+            })
+            return DetrObjectDetectionOutput(logits=torch.from_numpy(logits), pred_boxes=torch.from_numpy(boxes))
+        with torch.inference_mode():
+            return self.model(**inputs)
+
+    def input_limits(self) -> tuple[int | None, int | None]:
+        """(longest, shortest) edge the processor resizes to; larger inputs can be downscaled first."""
+        size = getattr(self.proc, "size", None) or {}
+        return size.get("longest_edge"), size.get("shortest_edge")
+
+    # --- inference ---
+    def detect_batch(self, images: list[Image.Image], confs: list[float],
+                     sizes: list[tuple[int, int] | None] | None = None) -> list[list[dict]]:
+        """
+        One forward pass over `images`; returns the obj_detect detection list per image.
+        Boxes are in `sizes[i]` (W, H) coordinates when given (the original size of a
+        downscaled input), otherwise in the input image's own coordinates.
+        """
+        import torch
+        with telemetry.span("detr.forward", batch=len(images), backend=self.backend):
+            outputs = self._forward(images)
+        sizes = sizes or [None] * len(images)
+        # DETR boxes are relative, so post-processing can scale them straight to the original size
+        target_sizes = torch.tensor([(sz or im.size)[::-1] for im, sz in zip(images, sizes)])  # (H, W)
+        results = self.proc.post_process_object_detection(
+            outputs, target_sizes=target_sizes, threshold=float(min(confs))
+        )
+        out = []
+        for res, conf in zip(results, confs):
+            dets = []
+            for score, label, box in zip(res["scores"], res["labels"], res["boxes"]):
+                s = float(score.item())
+                if s <= conf:
+                    continue
+                lid = int(label.item())
+                x1, y1, x2, y2 = [int(round(v)) for v in box.tolist()]
+                dets.append({"cls_id": lid, "cls_name": self.id2label.get(lid, str(lid)),
+                             "conf": s, "bbox_xyxy": [x1, y1, x2, y2]})
+            out.append(dets)
+        return out
+
+    def detect(self, image: Image.Image, conf: float = 0.25, size: tuple[int, int] | None = None) -> list[dict]:
+        """Queue one image for the next micro-batch and wait for its detections (see detect_batch)."""
+        if self.max_batch == 1:
+            return self.detect_batch([image], [conf], [size])[0]
+        fut: Future = Future()
+        self._queue.put((image, float(conf), size, fut))
+        self._ensure_worker()
+        return fut.result()
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._worker_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="detr-batcher", daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.wait_s
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                results = self.detect_batch([b[0] for b in batch], [b[1] for b in batch], [b[2] for b in batch])
+                for (*_, fut), dets in zip(batch, results):
+                    fut.set_result(dets)
+            except Exception as e:
+                for *_, fut in batch:
+                    fut.set_exception(e)
+
+_ENGINES: dict[tuple[str, str, str], DetrEngine] = {}
+_ENGINES_LOCK = threading.Lock()
+
+def get_engine(model_name: str, revision: str, backend: str = DETR_BACKEND) -> DetrEngine:
+    """Thread-safe registry: one engine per (model_name, revision, backend), loaded once."""
+    key = (model_name, revision, backend)
+    engine = _ENGINES.get(key)
+    if engine is None:
+        with _ENGINES_LOCK:  # held during load so concurrent first calls don't load twice
+            engine = _ENGINES.get(key)
+            if engine is None:
+                with telemetry.span("model.load", model=model_name, backend=backend):
+                    engine = _ENGINES[key] = DetrEngine(model_name, revision, backend)
+    return engine
@@ -0,0 +1,78 @@
+# app/tools/executor.py
+import re, time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Sequence
+from app.config import TOOL_MAX_CONCURRENCY, TOOL_TIMEOUTS, TOOL_DEFAULT_TIMEOUT
+
+_ERROR_RE = re.compile(r"^\[[\w ]*error\]")
+
+def is_error_output(out: str) -> bool:
+    """Tool outputs signal failure with a '[ocr error]' / '[tavily_error]' style prefix."""
+    return bool(_ERROR_RE.match(out or ""))
+
+def run_tools(jobs: Sequence[tuple[str, Callable[[], str]]],
+              max_workers: int = TOOL_MAX_CONCURRENCY,
+              timeouts: dict[str, float] = TOOL_TIMEOUTS,
+              default_timeout: float = TOOL_DEFAULT_TIMEOUT,
+              on_done: Callable[[int, str], None] | None = None) -> list[str]:
+    """
+    Run (tool_name, fn) jobs concurrently and return their outputs in job order.
+    A failure or timeout becomes that job's '[<tool> error] ...' string; the others keep running.
+    A job's timeout counts from when it starts, not while it waits for a free worker.
+    on_done(index, output) is called from the calling thread as each job finishes.
+    """
+    results: list[str | None] = [None] * len(jobs)
+
+    def finish(i: int, out: str):
+        results[i] = out
+        if on_done is not None:
+            on_done(i, out)
+    if not jobs:
+        return []
+    started: dict[int, float] = {}
+
+    def call(i: int, fn: Callable[[], str]) -> str:
+        started[i] = time.monotonic()
+        return fn()
+
+    workers = min(max_workers, len(jobs))
+    abandoned = set()  # timed-out futures; their worker is free again once they finish
+    ex = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tool")
+    try:
+        futs = {ex.submit(call, i, fn): i for i, (_, fn) in enumerate(jobs)}
+        pending = set(futs)
+        while pending:
+            now = time.monotonic()
+            deadlines = {f: started[futs[f]] + timeouts.get(jobs[futs[f]][0], default_timeout)
+                         for f in pending if futs[f] in started}
+            # Expire running jobs past their deadline (the thread is abandoned, not killed)
+            for f, deadline in deadlines.items():
+                if deadline <= now:
+                    name = jobs[futs[f]][0]
+                    secs = timeouts.get(name, default_timeout)
+                    finish(futs[f], f"[{name} error] timed out after {secs}s")
+                    pending.discard(f)
+                    abandoned.add(f)
+            if sum(not f.done() for f in abandoned) >= workers:
+                # Every worker is still stuck in a timed-out call; queued jobs would never start
+                for f in [f for f in pending if futs[f] not in started]:
+                    finish(futs[f], f"[{jobs[futs[f]][0]} error] not run: all tool workers timed out")
+                    pending.discard(f)
+            if not pending:
+                break
+            waiting = [deadlines[f] for f in pending if f in deadlines]
+            if len(waiting) < len(pending):
+                timeout = 0.05  # some jobs are still queued; re-check once they start
+            else:
+                timeout = max(0.0, min(waiting) - now)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for f in done:
+                name = jobs[futs[f]][0]
+                try:
+                    out = f.result()
+                except Exception as e:
+                    out = f"[{name} error] {e}"
+                finish(futs[f], out)
+    finally:
+        ex.shutdown(wait=False, cancel_futures=True)
+    return results  # type: ignore[return-value]
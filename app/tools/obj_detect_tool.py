@@ -1,13 +1,13 @@
 # app/tools/obj_detect_tool.py
-import os, json, base64, io
+import json
 from typing import Tuple
-import numpy as np
-import torch
-from PIL import Image, ImageDraw, ImageFont
+from PIL import ImageDraw, ImageFont
 from langchain_core.tools import tool
-from transformers import DetrImageProcessor, DetrForObjectDetection
-from app.utils import load_image_any
-from app.config import OUTPUT_DIR
+from app.images import get_image
+from app.tools.detr_engine import get_engine
+from app.cache import cache_key, get_cache
+from app.artifacts import get_store
+from app.config import DETR_BACKEND, RESULT_CACHE, CACHE_TTL_VISION_S
 
 def _draw_label(draw: ImageDraw.ImageDraw, xy: Tuple[int,int], text: str):
     """Draw a small filled label box + text using PIL only."""
@@ -21,76 +21,71 @@ def _draw_label(draw: ImageDraw.ImageDraw, xy: Tuple[int,int], text: str):
     # text
     draw.text((x + pad, y - th - pad), text, fill=(0,0,0), font=font)
 
+def warm_up(model_name: str = "facebook/detr-resnet-50", revision: str = "no_timm"):
+    """Import torch/transformers and load the default DETR weights ahead of the first call."""
+    get_engine(model_name, revision)
+
 @tool
 def obj_detect(
     image: str,
     conf: float = 0.25,
     model_name: str = "facebook/detr-resnet-50",
     revision: str = "no_timm",
-    return_data_url: bool = True,
 ) -> str:
     """
-    DETR object detection (no OpenCV). Returns JSON with detections, a saved
-    annotated image path, and (optionally) a data_url for UI that supports it.
+    DETR object detection (no OpenCV). Returns JSON with detections and an
+    'artifact' handle for the annotated image (the UI resolves it to the file).
     """
     try:
-        # Load image (local path, data URL, or http URL)
-        img_pil = Image.open(image).convert("RGB") if os.path.exists(image) else load_image_any(image)
-
-        # Lazy-load & cache model/processor on the function
-        if not hasattr(obj_detect, "_proc"):
-            obj_detect._proc = DetrImageProcessor.from_pretrained(model_name, revision=revision)
-        if not hasattr(obj_detect, "_model"):
-            obj_detect._model = DetrForObjectDetection.from_pretrained(model_name, revision=revision).eval()
+        handle = get_image(image)  # read once; ocr in the same turn reuses it
+    except Exception as e:
+        return f"[obj_detect error] {e}"
+    run = lambda: _detect(handle, conf, model_name, revision)
+    if not RESULT_CACHE:
+        return run()
 
-        proc  = obj_detect._proc
-        model = obj_detect._model
+    cache = get_cache("obj_detect", CACHE_TTL_VISION_S)
+    key = cache_key("obj_detect", handle.digest, float(conf), model_name, revision, DETR_BACKEND)
+    hit = cache.get(key)
+    if hit is not None:
+        payload = json.loads(hit[len("[obj_detect ok]"):])
+        if get_store().path(payload.get("artifact", "")):  # artifacts expire after ARTIFACT_TTL_S
+            return hit
+    out = run()
+    if out.startswith("[obj_detect ok]"):
+        cache.set(key, out)
+    return out
 
-        # Forward pass (DETR can take PIL directly)
-        inputs = proc(images=img_pil, return_tensors="pt")
-        with torch.no_grad():
-            outputs = model(**inputs)
+def _detect(handle, conf: float, model_name: str, revision: str) -> str:
+    try:
+        # Decode at (at most) the resolution the DETR processor resizes to
+        engine = get_engine(model_name, revision)
+        longest, shortest = engine.input_limits()
+        img_pil = handle.rgb(max_side=longest, max_short=shortest)
 
-        # Post-process to boxes
-        target_sizes = torch.tensor([img_pil.size[::-1]])  # (H, W)
-        results = proc.post_process_object_detection(outputs, target_sizes=target_sizes, threshold=float(conf))[0]
+        # Shared CPU engine; concurrent calls are micro-batched into one forward pass.
+        # Boxes come back in original-image coordinates.
+        dets = engine.detect(img_pil, conf=float(conf), size=handle.size)
 
-        # Draw with PIL
+        # Draw with PIL on the (downscaled) decoded image
+        sx, sy = handle.scale_to_original(img_pil)
         out = img_pil.copy()
         draw = ImageDraw.Draw(out)
-        dets = []
-
-        for score, label, box in zip(results["scores"], results["labels"], results["boxes"]):
-            s = float(score.item())
-            lid = int(label.item())
-            name = model.config.id2label.get(lid, str(lid))
-            x1, y1, x2, y2 = [int(round(v)) for v in box.tolist()]
-            dets.append({"cls_id": lid, "cls_name": name, "conf": s, "bbox_xyxy": [x1, y1, x2, y2]})
-
+        for d in dets:
+            x1, y1, x2, y2 = d["bbox_xyxy"]
+            x1, x2, y1, y2 = x1 / sx, x2 / sx, y1 / sy, y2 / sy
             # green rectangle
             draw.rectangle([x1, y1, x2, y2], outline=(0,255,0), width=2)
-            _draw_label(draw, (x1, y1), f"{name} {s:.2f}")
-
-        # Save annotated image
-        base = os.path.splitext(os.path.basename(getattr(img_pil, "filename", "image.png")))[0] or "image"
-        out_path = os.path.join(OUTPUT_DIR, f"annotated_{base}.png")
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
-        out.save(out_path, format="PNG")
+            _draw_label(draw, (x1, y1), f"{d['cls_name']} {d['conf']:.2f}")
 
+        # Save the annotated image out of band; the message only carries its handle
         payload = {
             "source": "obj_detect",
             "model": model_name,
             "conf": conf,
             "detections": dets,
-            "annotated_path": out_path
+            "artifact": get_store().put_image(out, "PNG"),
         }
-
-        if return_data_url:
-            buf = io.BytesIO()
-            out.save(buf, format="PNG")
-            b64 = base64.b64encode(buf.getvalue()).decode("utf-8")
-            payload["data_url"] = f"data:image/png;base64,{b64}"
-
         return f"[obj_detect ok] {json.dumps(payload)}"
 
     except Exception as e:
@@ -1,24 +1,271 @@
-import json, hashlib, os
+import base64, io, itertools, json, hashlib, math, os, queue, threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, Sequence
 from PIL import Image
 from langchain_core.tools import tool
-from rapidocr_onnxruntime import RapidOCR
-from app.utils import load_image_any
+from app.images import get_image
+from app.cache import cache_key, get_cache
+from app import telemetry
+from app.config import OCR_POOL_SIZE, OCR_INTRA_OP_THREADS, OCR_INTER_OP_THREADS, OCR_MAX_SIDE
+from app.config import OCR_TILING, OCR_TILE_SIZE, OCR_TILE_OVERLAP, OCR_TILE_MAX_SIDE, OCR_PDF_DPI, OCR_MAX_PAGES
+from app.config import RESULT_CACHE, CACHE_TTL_VISION_S
 
-@tool
-def ocr(image: str, hint: str = "") -> str:
+def _new_engine():
+    # Imported here so text-only turns never load onnxruntime
+    from rapidocr_onnxruntime import RapidOCR
+    return RapidOCR(
+        rec_model='onnx/ch_PP-OCRv3_rec.onnx',
+        intra_op_num_threads=OCR_INTRA_OP_THREADS,
+        inter_op_num_threads=OCR_INTER_OP_THREADS,
+    )
+
+class _EnginePool:
+    """Process-wide RapidOCR engines, created lazily up to `size` and checked out one per caller."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._idle = queue.LifoQueue()  # LIFO keeps the warmest engine in use
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def engine(self):
+        try:
+            eng = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = self._created < self.size
+                if grow:
+                    self._created += 1
+            if grow:
+                try:
+                    with telemetry.span("model.load", model="rapidocr"):
+                        eng = _new_engine()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                eng = self._idle.get()  # all engines busy: wait for one
+        try:
+            yield eng
+        finally:
+            self._idle.put(eng)
+
+_POOL = _EnginePool(OCR_POOL_SIZE)
+
+def warm_up():
+    """Import onnxruntime and load the OCR models ahead of the first call."""
+    with _POOL.engine():
+        pass
+
+Box = tuple[float, float, float, float]  # x1, y1, x2, y2
+
+def _infer(img: Image.Image, dx: int = 0, dy: int = 0) -> list[tuple[Box, str, float]]:
+    """RapidOCR on one image / tile; boxes (score > 0.5) shifted by the tile offset, in engine order."""
+    with _POOL.engine() as engine, telemetry.span("ocr.infer", width=img.size[0], height=img.size[1]):
+        result, _ = engine(img)
+    out = []
+    for pts, text, score in result or []:
+        if score > 0.5:
+            xs, ys = [p[0] for p in pts], [p[1] for p in pts]
+            out.append(((min(xs) + dx, min(ys) + dy, max(xs) + dx, max(ys) + dy), text, score))
+    return out
+
+def _starts(length: int, tile: int, overlap: int) -> list[int]:
+    """Tile origins along one axis: evenly spread, covering [0, length), overlapping by >= overlap."""
+    if length <= tile:
+        return [0]
+    n = math.ceil((length - overlap) / (tile - overlap))
+    return [round(i * (length - tile) / (n - 1)) for i in range(n)]
+
+def _tiles(img: Image.Image) -> list[tuple[int, int, Image.Image]]:
+    w, h = img.size
+    if max(w, h) <= OCR_MAX_SIDE or not OCR_TILING:
+        return [(0, 0, img)]
+    return [(x, y, img.crop((x, y, min(x + OCR_TILE_SIZE, w), min(y + OCR_TILE_SIZE, h))))
+            for y in _starts(h, OCR_TILE_SIZE, OCR_TILE_OVERLAP) for x in _starts(w, OCR_TILE_SIZE, OCR_TILE_OVERLAP)]
+
+def _area(b: Box) -> float:
+    return max(0.0, b[2] - b[0]) * max(0.0, b[3] - b[1])
+
+def _seen_in(b: Box, k: Box) -> bool:
+    """b is (nearly) all of its width inside k, on the same line: the same text read by two tiles."""
+    w = min(b[2], k[2]) - max(b[0], k[0])
+    h = min(b[3], k[3]) - max(b[1], k[1])
+    return w >= 0.9 * (b[2] - b[0]) and h >= 0.5 * (b[3] - b[1])
+
+def _join(a: tuple[Box, str, float], b: tuple[Box, str, float]) -> tuple[Box, str, float]:
+    """Two pieces of one line cut by a vertical seam (a left of b, overlapping): drop the repeated characters."""
+    (ba, ta, sa), (bb, tb, sb) = a, b
+    # Both tiles read the overlap; compare without spaces, which RapidOCR doesn't always keep
+    na, nb = ta.replace(" ", ""), tb.replace(" ", "")
+    k = next((k for k in range(min(len(na), len(nb)), 2, -1) if na.endswith(nb[:k])), 0)
+    if not k:  # no exact repeat (a glyph misread or cut): estimate from the overlap width
+        char_w = (bb[2] - bb[0]) / max(1, len(nb))
+        k = min(len(nb), round(max(0.0, ba[2] - bb[0]) / char_w)) if char_w else 0
+    i = 0
+    for _ in range(k):  # skip k non-space characters of tb
+        while tb[i] == " ":
+            i += 1
+        i += 1
+    box = (min(ba[0], bb[0]), min(ba[1], bb[1]), max(ba[2], bb[2]), max(ba[3], bb[3]))
+    return box, ta + tb[i:], min(sa, sb)
+
+def _merge_tiles(items: list[tuple[Box, str, float]]) -> list[str]:
     """
-    Run OCR (RapidOCR) on a local path or data URL; return JSON payload string.
+    Boxes from overlapping tiles -> text in reading order. A box inside a larger
+    one is the same text seen twice in an overlap; boxes on one line that
+    overlap horizontally are a line cut by a seam and are joined.
     """
+    kept: list[tuple[Box, str, float]] = []
+    for it in sorted(items, key=lambda it: -_area(it[0])):
+        if not any(_seen_in(it[0], k[0]) for k in kept):
+            kept.append(it)
+
+    # Reading order: rows top to bottom (centre within half the row's mean height), left to right within a row
+    rows: list[list[tuple[Box, str, float]]] = []
+    for it in sorted(kept, key=lambda it: (it[0][1] + it[0][3]) / 2):
+        cy = (it[0][1] + it[0][3]) / 2
+        if rows:
+            row = rows[-1]
+            row_cy = sum((b[1] + b[3]) / 2 for b, _, _ in row) / len(row)
+            row_h = sum(b[3] - b[1] for b, _, _ in row) / len(row)
+            if abs(cy - row_cy) <= 0.5 * row_h:
+                row.append(it)
+                continue
+        rows.append([it])
+    texts = []
+    for row in rows:
+        row.sort(key=lambda it: it[0][0])
+        merged = [row[0]]
+        for it in row[1:]:
+            if it[0][0] < merged[-1][0][2]:  # starts before the previous box ends
+                merged[-1] = _join(merged[-1], it)
+            else:
+                merged.append(it)
+        texts += [t for _, t, _ in merged]
+    return texts
+
+def _is_pdf(image: str) -> bool:
+    return image.startswith("data:application/pdf") or (os.path.isfile(image) and image.lower().endswith(".pdf"))
+
+def _read_pdf(image: str) -> bytes:
+    if image.startswith("data:"):
+        encoded = "".join(image.split(",", 1)[1].split())
+        return base64.b64decode(encoded + "=" * ((-len(encoded)) % 4), validate=False)
+    with open(image, "rb") as f:
+        return f.read()
+
+def _pdf_pages(data: bytes) -> Iterator[Image.Image]:
+    """Pages rendered at OCR_PDF_DPI (pypdfium2); without it, the largest embedded image per page (scans)."""
     try:
-        engine = RapidOCR(rec_model='onnx/ch_PP-OCRv3_rec.onnx')
-        img = Image.open(image) if os.path.exists(image) else load_image_any(image)
+        import pypdfium2 as pdfium
+    except ImportError:
+        pdfium = None
+    if pdfium is not None:
+        pdf = pdfium.PdfDocument(data)
+        try:
+            for i in range(min(len(pdf), OCR_MAX_PAGES)):
+                yield pdf[i].render(scale=OCR_PDF_DPI / 72).to_pil().convert("RGB")
+        finally:
+            pdf.close()
+        return
+    from pypdf import PdfReader
+    for page in PdfReader(io.BytesIO(data)).pages[:OCR_MAX_PAGES]:
+        images = [im.image for im in page.images]
+        if images:
+            yield max(images, key=lambda im: im.size[0] * im.size[1]).convert("RGB")
 
-        result, _ = engine(img)
-        texts = [t for _, t, score in result if score > 0.5]
-        text = "\n".join(texts).strip() or "[ocr: no text detected]"
+def _pages(image: str | Image.Image) -> Iterator[Image.Image]:
+    """The page(s) to OCR, decoded at the size OCR will use (tiles keep full detail up to OCR_TILE_MAX_SIDE)."""
+    if isinstance(image, Image.Image):
+        yield image
+        return
+    if _is_pdf(image):
+        yield from _pdf_pages(_read_pdf(image))
+        return
+    handle = get_image(image)
+    max_side = OCR_TILE_MAX_SIDE if OCR_TILING else OCR_MAX_SIDE
+    if handle.n_frames > 1:
+        yield from itertools.islice(handle.frames(max_side), OCR_MAX_PAGES)
+    else:
+        # Without tiling RapidOCR shrinks anything larger than its max_side_len; decode at that size
+        yield handle.rgb(max_side=max_side)
+
+def _page_text(tiles: list, results: list[list[tuple[Box, str, float]]]) -> str:
+    if len(tiles) == 1:
+        texts = [t for _, t, _ in results[0]]  # untiled: RapidOCR's own order, as before
+    else:
+        texts = _merge_tiles([it for r in results for it in r])
+    return "\n".join(texts).strip()
+
+def _ocr_one(image: str | Image.Image, hint: str = "") -> str:
+    try:
+        # Tiles of all pages share the engine pool; a few pages are decoded ahead, not the whole document
+        page_texts = []
+        inflight: deque = deque()
+        with ThreadPoolExecutor(max_workers=_POOL.size, thread_name_prefix="ocr-tile") as ex:
+            for page in _pages(image):
+                tiles = _tiles(page)
+                inflight.append((tiles, [ex.submit(telemetry.bind(_infer), t, x, y) for x, y, t in tiles]))
+                while len(inflight) > _POOL.size:
+                    tiles, futs = inflight.popleft()
+                    page_texts.append(_page_text(tiles, [f.result() for f in futs]))
+            while inflight:
+                tiles, futs = inflight.popleft()
+                page_texts.append(_page_text(tiles, [f.result() for f in futs]))
+
+        if len(page_texts) > 1:
+            text = "\n\n".join(f"[page {i}]\n{t}" for i, t in enumerate(page_texts, 1) if t).strip()
+        else:
+            text = "".join(page_texts)
+        text = text or "[ocr: no text detected]"
 
         payload = {"source": "ocr", "hint": hint, "text": text}
         payload["sha1"] = hashlib.sha1(text.encode("utf-8")).hexdigest()
         return f"[ocr ok] {json.dumps(payload, ensure_ascii=False)}"
     except Exception as e:
         return f"[ocr error] {e}"
+
+# Settings that change what _ocr_one returns; part of the result-cache key, so changing one re-OCRs
+_OUTPUT_SETTINGS = (OCR_MAX_SIDE, OCR_TILING, OCR_TILE_SIZE, OCR_TILE_OVERLAP, OCR_TILE_MAX_SIDE,
+                    OCR_PDF_DPI, OCR_MAX_PAGES)
+
+def _ocr_cached(image: str | Image.Image, hint: str = "") -> str:
+    """_ocr_one behind the shared result cache, keyed by the image bytes + hint + output settings."""
+    if not RESULT_CACHE:
+        return _ocr_one(image, hint)
+    try:
+        if isinstance(image, Image.Image):
+            digest = hashlib.sha256(image.tobytes() + repr((image.mode, image.size)).encode()).hexdigest()
+        elif _is_pdf(image):
+            digest = hashlib.sha256(_read_pdf(image)).hexdigest()
+        else:
+            digest = get_image(image).digest  # read once; obj_detect in the same turn reuses it
+    except Exception as e:
+        return f"[ocr error] {e}"
+    return get_cache("ocr", CACHE_TTL_VISION_S).get_or_compute(
+        cache_key("ocr", digest, hint, *_OUTPUT_SETTINGS),
+        lambda: _ocr_one(image, hint),
+        cacheable=lambda out: out.startswith("[ocr ok]"),
+    )
+
+def ocr_batch(images: Sequence[str | Image.Image], hint: str = "") -> list[str]:
+    """
+    OCR many images/pages concurrently on the engine pool. Returns one
+    '[ocr ok] {...}' / '[ocr error] ...' string per input, in input order.
+    """
+    if not images:
+        return []
+    with ThreadPoolExecutor(max_workers=min(_POOL.size, len(images)), thread_name_prefix="ocr") as ex:
+        return list(ex.map(lambda im: _ocr_cached(im, hint), images))
+
+@tool
+def ocr(image: str, hint: str = "") -> str:
+    """
+    Run OCR (RapidOCR) on a local path or data URL (image, multi-page TIFF or PDF); return JSON payload string.
+    """
+    return _ocr_cached(image, hint)
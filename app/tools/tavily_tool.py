@@ -1,16 +1,29 @@
-import os, requests
+import os
 from langchain_core.tools import tool
-from app.config import TAVILY_API_KEY
+from app.config import TAVILY_API_KEY, TAVILY_URL, RESULT_CACHE, CACHE_TTL_TAVILY_S
+from app.cache import cache_key, get_cache
+from app.http_client import get_session, timeout
 
 @tool
 def tavily_search(query: str) -> str:
     """Search web with Tavily and return an answer string (may be brief)."""
+    if not RESULT_CACHE:
+        return _search(query)
+    normalized = " ".join(query.lower().split())
+    return get_cache("tavily_search", CACHE_TTL_TAVILY_S).get_or_compute(
+        cache_key("tavily_search", normalized),
+        lambda: _search(query),
+        cacheable=lambda out: not out.startswith("[tavily_error]"),
+    )
+
+def _search(query: str) -> str:
     try:
-        resp = requests.post(
-            "https://api.tavily.com/search",
+        # Pooled keep-alive session with retries on 429/5xx (app/http_client.py)
+        resp = get_session().post(
+            TAVILY_URL,
             headers={"Authorization": f"Bearer {TAVILY_API_KEY}"},
             json={"query": query, "search_depth": "basic", "include_answer": True, "max_results": 5},
-            timeout=20
+            timeout=timeout(20)
         )
         resp.raise_for_status()
         return resp.json().get("answer") or "No relevant online info found."
@@ -16,10 +16,8 @@ def load_image_any(image: str) -> PILImage:
         im.load()
         return im.convert("RGB")
     if image.startswith(("http://", "https://")):
-        import requests
-        r = requests.get(image, timeout=15)
-        r.raise_for_status()
-        im = PILImage.open(io.BytesIO(r.content))
+        from app.http_client import fetch_image_bytes
+        im = PILImage.open(io.BytesIO(fetch_image_bytes(image)))
         im.load()
         return im.convert("RGB")
     raise ValueError("invalid image input (not a path, data URL, or http URL)")
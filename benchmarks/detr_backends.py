@@ -0,0 +1,107 @@
+# benchmarks/detr_backends.py
+"""
+Compare DETR CPU backends (fp32 torch, int8 dynamic-quantized, ONNX Runtime)
+against the fp32 path on a local image folder: per-image latency, batched
+throughput and detection agreement with fp32.
+
+    python -m benchmarks.detr_backends --images path/to/images [--backends torch int8 onnx]
+"""
+import argparse, json, statistics, time
+from pathlib import Path
+from PIL import Image
+
+IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".webp", ".bmp"}
+
+def _iou(a, b) -> float:
+    ix1, iy1, ix2, iy2 = max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def agreement(ref: list[list[dict]], got: list[list[dict]], iou: float = 0.5) -> dict:
+    """Greedy same-class IoU matching of `got` against the fp32 reference detections."""
+    matched = n_ref = n_got = 0
+    score_deltas = []
+    for ref_dets, got_dets in zip(ref, got):
+        n_ref += len(ref_dets)
+        n_got += len(got_dets)
+        used = set()
+        for r in ref_dets:
+            best, best_j = 0.0, None
+            for j, g in enumerate(got_dets):
+                if j in used or g["cls_id"] != r["cls_id"]:
+                    continue
+                v = _iou(r["bbox_xyxy"], g["bbox_xyxy"])
+                if v > best:
+                    best, best_j = v, j
+            if best_j is not None and best >= iou:
+                used.add(best_j)
+                matched += 1
+                score_deltas.append(abs(r["conf"] - got_dets[best_j]["conf"]))
+    return {
+        "recall_vs_fp32": matched / n_ref if n_ref else 1.0,
+        "precision_vs_fp32": matched / n_got if n_got else 1.0,
+        "mean_abs_score_delta": statistics.fmean(score_deltas) if score_deltas else 0.0,
+        "detections": n_got,
+    }
+
+def run_backend(engine, images, conf: float, runs: int, batch: int) -> tuple[dict, list]:
+    engine.detect_batch(images[:1], [conf])  # warm-up (first call pays allocator/graph setup)
+    per_image, dets = [], []
+    for _ in range(runs):
+        dets = []
+        for im in images:
+            t0 = time.perf_counter()
+            dets.append(engine.detect_batch([im], [conf])[0])
+            per_image.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    for i in range(0, len(images), batch):
+        chunk = images[i:i + batch]
+        engine.detect_batch(chunk, [conf] * len(chunk))
+    batched = time.perf_counter() - t0
+    per_image.sort()
+    stats = {
+        "p50_ms": 1000 * per_image[len(per_image) // 2],
+        "p95_ms": 1000 * per_image[min(len(per_image) - 1, int(len(per_image) * 0.95))],
+        "mean_ms": 1000 * statistics.fmean(per_image),
+        f"batched_x{batch}_img_per_s": len(images) / batched if batched else 0.0,
+    }
+    return stats, dets
+
+def main():
+    from app.tools.detr_engine import DetrEngine, BACKENDS
+    p = argparse.ArgumentParser()
+    p.add_argument("--images", required=True, help="Folder of test images")
+    p.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    p.add_argument("--model", default="facebook/detr-resnet-50")
+    p.add_argument("--revision", default="no_timm")
+    p.add_argument("--conf", type=float, default=0.25)
+    p.add_argument("--runs", type=int, default=3)
+    p.add_argument("--batch", type=int, default=4)
+    p.add_argument("--out", default="", help="Optional JSON report path")
+    args = p.parse_args()
+
+    paths = sorted(q for q in Path(args.images).iterdir() if q.suffix.lower() in IMAGE_EXTS)
+    if not paths:
+        p.error(f"no images in {args.images}")
+    images = [Image.open(q).convert("RGB") for q in paths]
+
+    report, ref = {}, None
+    for backend in ["torch"] + [b for b in args.backends if b != "torch"]:
+        t0 = time.perf_counter()
+        engine = DetrEngine(args.model, args.revision, backend, max_batch=1)
+        load_s = time.perf_counter() - t0
+        stats, dets = run_backend(engine, images, args.conf, args.runs, args.batch)
+        stats["load_s"] = load_s
+        if ref is None:
+            ref = dets
+        stats.update(agreement(ref, dets))
+        report[backend] = stats
+        print(f"{backend:>6}: " + ", ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}"
+                                            for k, v in stats.items()))
+
+    if args.out:
+        Path(args.out).write_text(json.dumps({"images": len(images), "backends": report}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+# benchmarks/e2e.py
+"""
+Offline end-to-end latency benchmark for the agent graph.
+
+Builds the real graph (app.graph.build_graph) with the real RAG index, OCR and
+DETR, on generated fixtures in a throwaway DATA_BASE. Only the network calls
+are replaced by deterministic stand-ins with configurable latency
+(benchmarks/standins.py): the chat model, Tavily, the embedding model and the
+RAG synthesis LLM. Result caches and the semantic cache are off, so every turn
+does the full work.
+
+Per scenario (text, rag, ocr, detection, multi-tool) it reports p50/p95/p99 of
+each graph node, each tool and the whole turn (sequential runs), throughput
+with --concurrency parallel turns, and peak RSS of the process so far.
+
+    python -m benchmarks.e2e [--scenarios text,ocr] [--turns 20] [--concurrency 4]
+                             [--llm-latency 0.5] [--out e2e.json]
+                             [--baseline old.json --tolerance 0.2]
+
+With --baseline, any p95 that grew by more than --tolerance (and by more than
+--min-delta-ms) is listed and the exit status is 1, so it can gate CI.
+--tiny-detr swaps in a small randomly initialised DETR so the detection
+scenarios run without downloading weights (smoke tests only; its timings are
+not representative).
+"""
+import argparse, json, os, platform, re, resource, sys, tempfile, threading, time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+SCENARIOS = {
+    "text": {
+        "questions": ["Hi! What can you help me with?", "Thanks, that is all for now."],
+        "tools": [],
+    },
+    "rag": {
+        "questions": [
+            "What did the litter study find about cigarette butts and plastic bottles near bus stops and hawker centres?",
+            "How do town councils schedule cleaners and inspections, and how are complaints about public spaces handled?",
+            "Summarise recycling contamination in blue bins, e-waste collection points and household outreach.",
+            "How are fines, warnings and Corrective Work Orders used against high-rise littering and repeat offenders?",
+        ],
+        "tools": [],
+    },
+    "ocr": {
+        "questions": ["What does this sign say?"],
+        "tools": [("ocr", {"image": "{sign}"})],
+    },
+    "detection": {
+        "questions": ["What objects are in this photo?"],
+        "tools": [("obj_detect", {"image": "{photo}"})],
+    },
+    "multi-tool": {
+        "questions": ["Read the sign, check the street photo for objects and look up the current littering fine."],
+        "tools": [("tavily_search", {"query": "Singapore littering fine"}),
+                  ("ocr", {"image": "{sign}"}),
+                  ("obj_detect", {"image": "{street}"})],
+    },
+}
+
+def percentiles(samples: list[float]) -> dict:
+    """Nearest-rank p50/p95/p99 plus mean and count, in milliseconds."""
+    if not samples:
+        return {"n": 0}
+    s = sorted(samples)
+    pick = lambda q: s[min(len(s) - 1, max(0, round(q * len(s) + 0.5) - 1))]
+    return {"n": len(s), "mean_ms": 1000 * sum(s) / len(s),
+            "p50_ms": 1000 * pick(0.50), "p95_ms": 1000 * pick(0.95), "p99_ms": 1000 * pick(0.99)}
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB on Linux
+
+class Timings:
+    """Thread-safe sample collector; only records while `enabled`."""
+
+    def __init__(self):
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.enabled = False
+        self._lock = threading.Lock()
+
+    def add(self, key: str, secs: float):
+        if self.enabled:
+            with self._lock:
+                self.samples[key].append(secs)
+
+    def reset(self):
+        with self._lock:
+            self.samples = defaultdict(list)
+
+def node_timer(timings: Timings):
+    """LangChain callback handler timing each graph node run (one sample per node execution)."""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class NodeTimer(BaseCallbackHandler):
+        def __init__(self):
+            self._start: dict = {}
+
+        def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+            node = (metadata or {}).get("langgraph_node")
+            # The node itself, not runnables nested inside it (agent's RunnableLambda shares its name)
+            if node and kwargs.get("name") == node and parent_run_id not in self._start:
+                self._start[run_id] = (node, time.perf_counter())
+
+        def on_chain_end(self, outputs, *, run_id, **kwargs):
+            start = self._start.pop(run_id, None)
+            if start:
+                timings.add(f"node:{start[0]}", time.perf_counter() - start[1])
+
+        def on_chain_error(self, error, *, run_id, **kwargs):
+            self._start.pop(run_id, None)
+
+    return NodeTimer()
+
+class TimedTool:
+    """Wraps a tool object so tool_node's t.invoke(args) calls are timed per tool."""
+
+    def __init__(self, tool, timings: Timings):
+        self.tool, self.timings = tool, timings
+
+    def invoke(self, args):
+        t0 = time.perf_counter()
+        try:
+            return self.tool.invoke(args)
+        finally:
+            self.timings.add(f"tool:{self.tool.name}", time.perf_counter() - t0)
+
+def setup(args, timings: Timings) -> dict:
+    """Fixtures, env and stand-ins; must run before anything under app/ is imported."""
+    base = Path(args.data_dir or tempfile.mkdtemp(prefix="e2e-bench-"))
+    os.environ.update(DATA_BASE=str(base), RESULT_CACHE="0", SEMANTIC_CACHE="0", RAG_MODE=args.rag_mode)
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+    os.environ.setdefault("TAVILY_API_KEY", "offline-benchmark")
+
+    from benchmarks.fixtures import write_documents, write_images
+    from benchmarks.standins import HashEmbedding, ScriptedChatModel, SlowMockLLM, fake_tavily
+    from app.config import DOC_DIR
+    write_documents(DOC_DIR, paragraphs=args.doc_paragraphs)
+    images = {k: str(v) for k, v in write_images(base / "images").items()}
+
+    from llama_index.core import Settings
+    Settings.embed_model = HashEmbedding(latency_s=args.embed_latency)
+    Settings.llm = SlowMockLLM(latency_s=args.llm_latency, max_tokens=256)
+
+    import app.graph as graph_mod
+    import app.tools.tavily_tool as tavily_mod
+    tavily_mod._search = fake_tavily(args.tavily_latency)
+    for name in ("tavily_search", "ocr", "obj_detect"):
+        setattr(graph_mod, name, TimedTool(getattr(graph_mod, name), timings))
+
+    plans = {}
+    for scen, spec in SCENARIOS.items():
+        plans[scen] = [(tool, {k: v.format(**images) for k, v in a.items()}) for tool, a in spec["tools"]]
+
+    def plan(question: str):
+        m = re.search(r"\[bench:([\w-]+)\]", question)
+        return plans.get(m.group(1), []) if m else []
+
+    chat = ScriptedChatModel(plan=plan, latency_s=args.llm_latency, per_token_s=args.llm_per_token)
+    graph_mod._llm_with_tools = lambda: chat
+
+    if args.tiny_detr:
+        import torch
+        from transformers import DetrConfig, DetrForObjectDetection, DetrImageProcessor
+        from app.config import DETR_BACKEND
+        from app.tools import detr_engine
+        torch.manual_seed(0)
+        cfg = DetrConfig(use_timm_backbone=False, use_pretrained_backbone=False, num_queries=20,
+                         encoder_layers=2, decoder_layers=2)
+        key = ("facebook/detr-resnet-50", "no_timm", DETR_BACKEND)
+        detr_engine._ENGINES[key] = detr_engine.DetrEngine(
+            *key, model=DetrForObjectDetection(cfg).eval(), processor=DetrImageProcessor())
+
+    t0 = time.perf_counter()
+    from app.rag import get_query_engine
+    get_query_engine()
+    return {"data_base": str(base), "images": images, "index_build_s": time.perf_counter() - t0}
+
+def run_turn(graph, system_msg, scenario: str, question: str, thread_id: str, callbacks=None) -> tuple[float, int]:
+    """One user turn through the graph; returns (seconds, tool errors)."""
+    from langchain_core.messages import HumanMessage, ToolMessage
+    from app.tools.executor import is_error_output
+    config = {"configurable": {"thread_id": thread_id}}
+    if callbacks:
+        config["callbacks"] = callbacks
+    text = question + f"\n[bench:{scenario}]"  # tells ScriptedChatModel which tool plan to follow
+    t0 = time.perf_counter()
+    out = graph.invoke({"messages": [system_msg, HumanMessage(content=text)]}, config)
+    secs = time.perf_counter() - t0
+    errors = sum(1 for m in out["messages"] if isinstance(m, ToolMessage) and is_error_output(str(m.content)))
+    return secs, errors
+
+def run_scenario(graph, system_msg, scenario: str, args, timings: Timings) -> dict:
+    questions = SCENARIOS[scenario]["questions"]
+    run_turn(graph, system_msg, scenario, questions[0], f"{scenario}-warmup")  # model loads, first decodes
+
+    # Sequential turns: clean per-node / per-tool latencies
+    timings.reset()
+    timings.enabled = True
+    turns, errors = [], 0
+    for i in range(args.turns):
+        secs, err = run_turn(graph, system_msg, scenario, questions[i % len(questions)],
+                             f"{scenario}-seq-{i}", [node_timer(timings)])
+        turns.append(secs)
+        errors += err
+    timings.enabled = False
+    result = {
+        "turn": percentiles(turns),
+        "nodes": {k.split(":", 1)[1]: percentiles(v) for k, v in sorted(timings.samples.items()) if k.startswith("node:")},
+        "tools": {k.split(":", 1)[1]: percentiles(v) for k, v in sorted(timings.samples.items()) if k.startswith("tool:")},
+    }
+
+    # Concurrent turns: throughput and latency under load, one thread_id per turn
+    n = args.turns
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as ex:
+        futs = [ex.submit(run_turn, graph, system_msg, scenario, questions[i % len(questions)],
+                          f"{scenario}-par-{i}") for i in range(n)]
+        loaded = [f.result() for f in futs]
+    wall = time.perf_counter() - t0
+    errors += sum(e for _, e in loaded)
+    result["concurrent"] = {"concurrency": args.concurrency, "turns": n, "wall_s": wall,
+                            "throughput_turns_per_s": n / wall, "turn": percentiles([s for s, _ in loaded])}
+    result["tool_errors"] = errors
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+def compare(current: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> list[str]:
+    """p95 regressions of turns, nodes and tools against a previous --out file."""
+    regressions = []
+    for scen, res in current["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(scen)
+        if not old:
+            continue
+        pairs = [("turn", res["turn"], old.get("turn", {}))]
+        for group in ("nodes", "tools"):
+            pairs += [(f"{group[:-1]} {k}", v, old.get(group, {}).get(k, {})) for k, v in res[group].items()]
+        for label, new, prev in pairs:
+            if "p95_ms" not in new or "p95_ms" not in prev:
+                continue
+            delta = new["p95_ms"] - prev["p95_ms"]
+            if delta > min_delta_ms and new["p95_ms"] > prev["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{scen}/{label}: p95 {prev['p95_ms']:.1f} -> {new['p95_ms']:.1f} ms "
+                                   f"(+{100 * delta / max(prev['p95_ms'], 1e-9):.0f}%)")
+    return regressions
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of: " + ", ".join(SCENARIOS))
+    p.add_argument("--turns", type=int, default=20, help="Measured turns per scenario (sequential and concurrent)")
+    p.add_argument("--concurrency", type=int, default=4)
+    p.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per chat / synthesis LLM call")
+    p.add_argument("--llm-per-token", type=float, default=0.0, help="Extra seconds per generated token")
+    p.add_argument("--tavily-latency", type=float, default=0.8)
+    p.add_argument("--embed-latency", type=float, default=0.05, help="Seconds per embedding request")
+    p.add_argument("--rag-mode", default="synthesize", choices=("synthesize", "retrieve"))
+    p.add_argument("--doc-paragraphs", type=int, default=40, help="Corpus size: paragraphs per generated document")
+    p.add_argument("--data-dir", default="", help="DATA_BASE to use (default: a new temp dir)")
+    p.add_argument("--tiny-detr", action="store_true", help="Random-init DETR, no weight download (smoke test)")
+    p.add_argument("--out", default="")
+    p.add_argument("--baseline", default="", help="Previous --out JSON to check p95 regressions against")
+    p.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative p95 growth vs --baseline")
+    p.add_argument("--min-delta-ms", type=float, default=5.0, help="Ignore p95 growth smaller than this")
+    args = p.parse_args()
+    selected = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in selected if s not in SCENARIOS]
+    if unknown:
+        p.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    timings = Timings()
+    env = setup(args, timings)
+    print(f"index built in {env['index_build_s']:.2f}s (data: {env['data_base']})")
+
+    from app.graph import build_graph
+    graph, _, system_msg = build_graph()
+
+    report = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+                 "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                 "args": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+                 "index_build_s": env["index_build_s"]},
+        "scenarios": {},
+    }
+    for scen in selected:
+        res = report["scenarios"][scen] = run_scenario(graph, system_msg, scen, args, timings)
+        t, c = res["turn"], res["concurrent"]
+        print(f"{scen:>10}: turn p50={t['p50_ms']:.0f} p95={t['p95_ms']:.0f} p99={t['p99_ms']:.0f} ms | "
+              f"{c['throughput_turns_per_s']:.2f} turns/s @{c['concurrency']} | "
+              f"peak RSS {res['peak_rss_mb']:.0f} MB" + (f" | {res['tool_errors']} tool errors" if res["tool_errors"] else ""))
+        for group in ("nodes", "tools"):
+            for name, s in res[group].items():
+                print(f"{'':>12}{group[:-1]} {name:<14} p50={s['p50_ms']:.0f} p95={s['p95_ms']:.0f} p99={s['p99_ms']:.0f} ms (n={s['n']})")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.tolerance, args.min_delta_ms)
+        for r in regressions:
+            print("REGRESSION " + r)
+        if regressions:
+            sys.exit(1)
+        print(f"no p95 regressions vs {args.baseline} (tolerance {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/fixtures.py
+"""
+Deterministic benchmark fixtures, generated on demand so no binaries live in
+the repo: a small document corpus for the RAG index and a few test images
+(a text sign for OCR, a street-like scene and a phone-sized photo for DETR).
+"""
+import random
+from pathlib import Path
+from PIL import Image, ImageDraw, ImageFont
+
+_TOPICS = {
+    "litter_study": ["litter", "cigarette butts", "plastic bottles", "food wrappers", "bus stops",
+                     "hawker centres", "void decks", "parks", "survey sites", "counts"],
+    "cleaning_ops": ["cleaners", "sweeping", "bins", "Corrective Work Orders", "town councils",
+                     "inspections", "schedules", "public spaces", "contractors", "complaints"],
+    "recycling": ["recycling bins", "contamination", "blue bins", "e-waste", "collection points",
+                  "households", "paper", "metal cans", "glass", "outreach"],
+    "enforcement": ["fines", "enforcement officers", "high-rise littering", "cameras", "warnings",
+                    "repeat offenders", "Corrective Work Orders", "court", "notices", "patrols"],
+}
+_VERBS = ["increased", "declined", "were observed at", "were concentrated near", "were reported by",
+          "were reduced through", "depend on", "were linked to", "improved after", "varied across"]
+
+def _sentence(rng: random.Random, words: list[str]) -> str:
+    a, b = rng.sample(words, 2)
+    return f"{a.capitalize()} {rng.choice(_VERBS)} {b} in {rng.randint(2015, 2024)} by {rng.randint(2, 60)} percent."
+
+def write_documents(doc_dir: Path, paragraphs: int = 40, seed: int = 7) -> list[Path]:
+    """One text file per topic, `paragraphs` paragraphs each."""
+    rng = random.Random(seed)
+    doc_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for topic, words in _TOPICS.items():
+        text = "\n\n".join(" ".join(_sentence(rng, words) for _ in range(rng.randint(4, 9)))
+                           for _ in range(paragraphs))
+        path = doc_dir / f"{topic}.txt"
+        path.write_text(f"{topic.replace('_', ' ').title()}\n\n{text}\n", encoding="utf-8")
+        paths.append(path)
+    return paths
+
+def _font(size: int):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1: fixed-size bitmap font
+        return ImageFont.load_default()
+
+def write_images(image_dir: Path, seed: int = 7) -> dict[str, Path]:
+    """sign.png (text for OCR), street.jpg (1280x720 shapes), photo.jpg (4032x3024 phone photo)."""
+    rng = random.Random(seed)
+    image_dir.mkdir(parents=True, exist_ok=True)
+
+    sign = Image.new("RGB", (1200, 500), (250, 250, 245))
+    draw = ImageDraw.Draw(sign)
+    for i, line in enumerate(["KEEP OUR PARKS CLEAN", "NO LITTERING", "FINE UP TO $2000"]):
+        draw.text((60, 60 + i * 140), line, fill=(20, 20, 20), font=_font(90))
+    sign.save(image_dir / "sign.png")
+
+    def scene(size):
+        img = Image.new("RGB", size, (120, 160, 200))
+        draw = ImageDraw.Draw(img)
+        w, h = size
+        draw.rectangle([0, h * 2 // 3, w, h], fill=(90, 90, 90))
+        for _ in range(8):
+            x, y = rng.randint(0, w * 3 // 4), rng.randint(h // 3, h * 3 // 4)
+            bw, bh = rng.randint(w // 12, w // 5), rng.randint(h // 10, h // 4)
+            draw.rectangle([x, y, x + bw, y + bh], fill=tuple(rng.randint(0, 255) for _ in range(3)))
+            draw.ellipse([x + bw // 8, y + bh, x + bw // 3, y + bh + bh // 4], fill=(20, 20, 20))
+        return img
+
+    scene((1280, 720)).save(image_dir / "street.jpg", quality=90)
+    scene((4032, 3024)).save(image_dir / "photo.jpg", quality=90)
+    return {"sign": image_dir / "sign.png", "street": image_dir / "street.jpg", "photo": image_dir / "photo.jpg"}
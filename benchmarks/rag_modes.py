@@ -0,0 +1,80 @@
+# benchmarks/rag_modes.py
+"""
+Compare the rag_node modes on the real index:
+  synthesize - QUERY_ENGINE.query(): retrieval + a synthesis LLM call
+  retrieve   - retriever only; top-k chunks go straight into the agent's context
+  hybrid     - retrieve, with BM25 first (RAG_RETRIEVAL=hybrid): confident lexical
+               matches skip the query embedding, the rest fuse BM25 + vector ranks
+
+Reports per-question latency of the RAG step, LLM/embedding tokens it spent and
+the size of the context handed to agent_node.
+
+    python -m benchmarks.rag_modes [--questions q.txt] [--runs 2] [--out rag_modes.json]
+"""
+import argparse, json, statistics, time
+from pathlib import Path
+
+DEFAULT_QUESTIONS = [
+    "What did the litter study find about the most common types of litter?",
+    "What are Corrective Work Orders and why is NEA making them more visible?",
+    "How does NEA keep public spaces clean?",
+    "Which locations had the highest litter counts in the 2021 study?",
+]
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--questions", default="", help="Text file, one question per line")
+    p.add_argument("--runs", type=int, default=1)
+    p.add_argument("--out", default="")
+    args = p.parse_args()
+    questions = ([q.strip() for q in Path(args.questions).read_text().splitlines() if q.strip()]
+                 if args.questions else DEFAULT_QUESTIONS)
+
+    # The handler must be installed before the index/query engine are created
+    from llama_index.core import Settings
+    from llama_index.core.callbacks import CallbackManager, TokenCountingHandler
+    counter = TokenCountingHandler()
+    Settings.callback_manager = CallbackManager([counter])
+
+    from app.rag import get_bm25, get_query_engine, retrieval_stats, retrieve_context
+    from app.rag.context import count_tokens
+    get_query_engine()  # load once, outside the timings
+    get_bm25()
+
+    def synthesize(q):
+        resp = get_query_engine().query(q)
+        return getattr(resp, "response", str(resp))
+
+    def retrieve(q):
+        return retrieve_context(q, retrieval="vector")[0]
+
+    def hybrid(q):
+        return retrieve_context(q, retrieval="hybrid")[0]
+
+    report = {}
+    for mode, fn in (("synthesize", synthesize), ("retrieve", retrieve), ("hybrid", hybrid)):
+        rows = []
+        for _ in range(args.runs):
+            for q in questions:
+                counter.reset_counts()
+                t0 = time.perf_counter()
+                ctx = fn(q)
+                rows.append({
+                    "latency_s": time.perf_counter() - t0,
+                    "llm_tokens": counter.total_llm_token_count,
+                    "embedding_tokens": counter.total_embedding_token_count,
+                    "context_tokens": count_tokens(ctx),
+                })
+        report[mode] = {k: statistics.fmean(r[k] for r in rows) for k in rows[0]}
+        report[mode]["p95_latency_s"] = sorted(r["latency_s"] for r in rows)[int(0.95 * (len(rows) - 1))]
+        print(f"{mode:>10}: " + ", ".join(f"{k}={v:.3f}" for k, v in report[mode].items()))
+    stats = retrieval_stats()
+    report["hybrid"].update(bm25_only=stats["bm25"], fused=stats["fused"], embeddings_avoided=stats["embeddings_avoided"])
+    print(f"{'':>10}  hybrid: {stats['bm25']} of {stats['bm25'] + stats['fused']} lookups answered by BM25 alone "
+          f"({stats['embeddings_avoided']} embedding calls avoided)")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps({"questions": questions, "modes": report}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# benchmarks/standins.py
+"""
+Deterministic local stand-ins for the network dependencies, each with a
+configurable latency: the chat model behind agent_node, the Tavily endpoint,
+the embedding model and the RAG synthesis LLM. The graph, RAG index, OCR and
+DETR stay real.
+"""
+import asyncio, hashlib, math, re, time
+from typing import Any, Callable
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.llms import MockLLM
+
+def _human_text(messages) -> str:
+    for m in reversed(messages):
+        if isinstance(m, HumanMessage):
+            c = m.content
+            return c if isinstance(c, str) else " ".join(p.get("text", "") for p in c if isinstance(p, dict))
+    return ""
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    ChatOpenAI stand-in. For a new user turn it returns the tool calls that
+    plan(question) asks for (none for text-only); once tool results are in,
+    a fixed answer. Each call sleeps latency_s (+ per_token_s per output token).
+    """
+
+    plan: Callable[[str], list[tuple[str, dict]]]
+    latency_s: float = 0.5
+    per_token_s: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-chat"
+
+    def _reply(self, messages) -> AIMessage:
+        turn = []
+        for m in reversed(messages):
+            if isinstance(m, HumanMessage):
+                break
+            turn.append(m)
+        calls = [] if any(isinstance(m, ToolMessage) for m in turn) else self.plan(_human_text(messages))
+        prompt_chars = sum(len(str(m.content)) for m in messages)
+        if calls:
+            msg = AIMessage(content="", tool_calls=[
+                {"name": name, "args": args, "id": f"call_{i}"} for i, (name, args) in enumerate(calls)
+            ])
+        else:
+            msg = AIMessage(content="Based on the context and tool results, here is a short answer. " * 3)
+        out_tokens = max(1, len(str(msg.content)) // 4)
+        msg.usage_metadata = {"input_tokens": prompt_chars // 4, "output_tokens": out_tokens,
+                              "total_tokens": prompt_chars // 4 + out_tokens}
+        return msg
+
+    def _delay(self, msg: AIMessage) -> float:
+        return self.latency_s + self.per_token_s * msg.usage_metadata["output_tokens"]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        msg = self._reply(messages)
+        time.sleep(self._delay(msg))
+        return ChatResult(generations=[ChatGeneration(message=msg)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        msg = self._reply(messages)
+        await asyncio.sleep(self._delay(msg))
+        return ChatResult(generations=[ChatGeneration(message=msg)])
+
+def fake_tavily(latency_s: float) -> Callable[[str], str]:
+    """Replacement for app.tools.tavily_tool._search."""
+    def search(query: str) -> str:
+        time.sleep(latency_s)
+        return f"Stand-in web answer for: {query[:80]}"
+    return search
+
+class HashEmbedding(BaseEmbedding):
+    """Bag-of-words hashed into `dim` buckets: deterministic, similar texts get similar vectors."""
+
+    dim: int = 256
+    latency_s: float = 0.0
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "HashEmbedding"
+
+    def _vec(self, text: str) -> list[float]:
+        v = [0.0] * self.dim
+        for tok in re.findall(r"\w+", text.lower()):
+            v[int.from_bytes(hashlib.md5(tok.encode()).digest()[:4], "little") % self.dim] += 1.0
+        norm = math.sqrt(sum(x * x for x in v)) or 1.0
+        return [x / norm for x in v]
+
+    def _get_query_embedding(self, query: str) -> list[float]:
+        time.sleep(self.latency_s)
+        return self._vec(query)
+
+    def _get_text_embedding(self, text: str) -> list[float]:
+        return self._vec(text)
+
+    def _get_text_embeddings(self, texts: list[str]) -> list[list[float]]:
+        time.sleep(self.latency_s)
+        return [self._vec(t) for t in texts]
+
+    async def _aget_query_embedding(self, query: str) -> list[float]:
+        return self._get_query_embedding(query)
+
+class SlowMockLLM(MockLLM):
+    """llama_index MockLLM (echoes the prompt) that sleeps latency_s per call, for RAG synthesis."""
+
+    latency_s: float = 0.5
+
+    def __init__(self, latency_s: float = 0.5, **kwargs: Any):
+        super().__init__(**kwargs)  # MockLLM.__init__ takes only its own fields
+        self.latency_s = latency_s
+
+    def complete(self, prompt, formatted: bool = False, **kwargs):
+        time.sleep(self.latency_s)
+        return super().complete(prompt, formatted=formatted, **kwargs)
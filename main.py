@@ -1,29 +1,78 @@
-import argparse
-from app.graph import build_graph
-from langchain_core.messages import SystemMessage, HumanMessage
+import argparse, json, os, sys
 
 def parse_args():
     p = argparse.ArgumentParser()
-    p.add_argument("--question", required=True, help="User question")
+    p.add_argument("--question", help="User question")
     p.add_argument("--image", default="", help="Local path or data URL (optional)")
-    return p.parse_args()
+    p.add_argument("--no-stream", action="store_true", help="Wait for the full answer instead of streaming tokens")
+    p.add_argument("--profile-startup", action="store_true",
+                   help="Print per-component import/initialization times, then answer --question if given")
+    p.add_argument("--batch", default="", help="JSONL file of {\"question\", \"image\"} records to answer in one process")
+    p.add_argument("--out", default="", help="Batch results JSONL, appended as records finish (default: <batch>.out.jsonl)")
+    p.add_argument("--concurrency", type=int, default=4, help="Batch records in flight at once")
+    p.add_argument("--retry-errors", action="store_true", help="On resume, re-run records that failed last time")
+    args = p.parse_args()
+    if not args.question and not args.profile_startup and not args.batch:
+        p.error("--question or --batch is required")
+    return args
+
+async def stream_answer(graph, inputs, config):
+    """Print tokens as they arrive; tool events go to stderr so stdout stays the answer."""
+    from app.streaming import astream_turn
+    print("\n=== ASSISTANT ===\n")
+    streamed = False
+    async for ev in astream_turn(graph, inputs, config):
+        if ev["event"] == "token":
+            print(ev["text"], end="", flush=True)
+            streamed = True
+        elif ev["event"] == "tool_start":
+            print(f"\n[tool] {ev['name']} started", file=sys.stderr, flush=True)
+        elif ev["event"] == "tool_end":
+            print(f"[tool] {ev['name']} {'done' if ev['ok'] else 'failed'}", file=sys.stderr, flush=True)
+        elif ev["event"] == "final" and not streamed:
+            print(ev["message"].content, end="")
+    print()
 
 def main():
     args = parse_args()
+    if args.profile_startup:
+        from app.startup import profile_startup, format_report
+        print("\n=== STARTUP PROFILE ===\n")
+        print(format_report(profile_startup()))
+        if not args.question:
+            return
+
+    if args.batch:
+        from app.batch import run_batch
+        out = args.out or os.path.splitext(args.batch)[0] + ".out.jsonl"
+        stats = run_batch(args.batch, out, args.concurrency, args.retry_errors)
+        print(f"\n=== BATCH ===\n{json.dumps(stats)}\nresults: {out}")
+        return
+
+    # Imported here so --profile-startup sees the cold import cost
+    from app.graph import build_graph
+    from app.batch import user_message
     graph, config, system_msg = build_graph()
 
     # Build user message: text + optional image path hint for tools
-    content = [{"type": "text", "text": args.question}]
-    if args.image:
-        content[0]["text"] += f"\nImage path: {args.image}"
+    msg = user_message(args.question, args.image)
+    inputs = {"messages": [system_msg, msg]}
+    try:
+        if not args.no_stream:
+            from app.llm import run
+            run(stream_answer(graph, inputs, config))
+            return
 
-    msg = HumanMessage(content=content)
-    result = graph.invoke({"messages": [system_msg, msg]}, config)
+        result = graph.invoke(inputs, config)
 
-    # Print final LLM message
-    final = result["messages"][-1]
-    print("\n=== ASSISTANT ===\n")
-    print(final.content)
+        # Print final LLM message
+        final = result["messages"][-1]
+        print("\n=== ASSISTANT ===\n")
+        print(final.content)
+    finally:
+        # One-shot run on a fresh thread_id: don't leave its checkpoints in the shared DB
+        from app.checkpoint import get_checkpointer
+        get_checkpointer().delete_thread(config["configurable"]["thread_id"])
 
 if __name__ == "__main__":
     main()
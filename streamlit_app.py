@@ -1,27 +1,37 @@
 # streamlit_app.py
 import os
-import io
 import json
-import tempfile
 from pathlib import Path
 import streamlit as st
-from app.config import DOC_DIR
-from app.rag.indexer import build_or_load_index
+from app.config import DOC_DIR, WARMUP
+from app.rag import request_reindex, reindex_status
+from app.startup import warm_up
 
 import streamlit as st
-from PIL import Image as PILImage
 
 from langchain_core.messages import SystemMessage, HumanMessage, ToolMessage, AIMessage, BaseMessage
 
 # Your app code
 from app.graph import build_graph
-from app.config import OUTPUT_DIR
+from app.checkpoint import get_checkpointer
+from app.artifacts import get_store
+from app.streaming import iter_turn
 
-# --- Helpers -----------------------------------------------------------------
+# Process-wide resources, shared by every browser session (reruns and new sessions reuse them)
+@st.cache_resource
+def shared_graph():
+    """(graph, default config, system message); sessions only differ by thread_id."""
+    return build_graph()
+
+@st.cache_resource
+def start_warm_up():
+    # Load the index and tool models in the background so the first question is fast
+    if WARMUP:
+        warm_up(background=True)
 
-def ensure_output_dir():
-    Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
-    return Path(OUTPUT_DIR)
+start_warm_up()
+
+# --- Helpers -----------------------------------------------------------------
 
 def _read_tool_payload(prefix: str, content: str):
     """Extract JSON payload from a tool string like: '[obj_detect ok] {...}'"""
@@ -37,30 +47,24 @@ def _read_tool_payload(prefix: str, content: str):
 
 def find_objdetect_artifacts(messages: list[BaseMessage]):
     """
-    Scan ToolMessages for obj_detect outputs. Return (annotated_path, data_url, dets).
-    If multiple, return the most recent.
+    Scan ToolMessages for obj_detect outputs. Return (image_bytes, dets) for the
+    most recent one whose artifact handle still resolves; the PNG is read as-is.
     """
-    annotated_path = None
-    data_url = None
-    dets = None
+    store = get_store()
     for m in messages[::-1]:
         if isinstance(m, ToolMessage):
             payload = _read_tool_payload("[obj_detect ok]", m.content)
             if payload and isinstance(payload, dict):
-                annotated_path = payload.get("annotated_path") or annotated_path
-                data_url = payload.get("data_url") or data_url
-                dets = payload.get("detections") or dets
-                if annotated_path or data_url:
-                    break
-    return annotated_path, data_url, dets
+                data = store.read_bytes(payload.get("artifact", ""))
+                if data is not None:
+                    return data, payload.get("detections") or []
+    return None, None
 
 def save_uploaded_image(uploaded_file) -> str:
-    """Save uploaded image to OUTPUT_DIR and return local path."""
-    ensure_output_dir()
+    """Store the upload as a content-addressed artifact and return its local path."""
     suffix = Path(uploaded_file.name).suffix or ".png"
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=str(OUTPUT_DIR)) as tmp:
-        tmp.write(uploaded_file.read())
-        return tmp.name
+    store = get_store()
+    return store.path(store.put(uploaded_file.read(), suffix))
 
 def build_user_message(question: str, image_path: str | None):
     text = question.strip()
@@ -75,25 +79,43 @@ st.sidebar.header("Upload RAG docs")
 files = st.sidebar.file_uploader(
     "Upload PDFs/TXTs/DOCX/MD", type=["pdf","txt","md","docx"], accept_multiple_files=True
 )
-if files:
+# The uploader keeps its files across reruns: only new uploads are written and indexed
+new_files = [f for f in files or [] if f.file_id not in st.session_state.setdefault("indexed_uploads", set())]
+if new_files:
     doc_dir = Path(DOC_DIR)
-    for f in files:
+    for f in new_files:
         (doc_dir / f.name).write_bytes(f.read())
-    st.sidebar.success(f"Uploaded {len(files)} file(s) to {doc_dir}")
-    # Rebuild the index so the new docs are searchable
-    build_or_load_index(doc_dir=str(doc_dir))
-
-# Initialize graph + memory (once per session)
-if "graph_bundle" not in st.session_state:
-    graph, config, system_msg = build_graph()
-    # Give each browser session its own thread_id so MemorySaver persists per user
-    # Replace the default thread_id with a session-scoped one
-    session_thread_id = f"tid-{os.urandom(8).hex()}"
-    config = {"configurable": {"thread_id": session_thread_id}}
-    st.session_state.graph_bundle = (graph, config, system_msg)
+        st.session_state.indexed_uploads.add(f.file_id)
+    st.sidebar.success(f"Uploaded {len(new_files)} file(s) to {doc_dir}")
+    # Indexed in the background; the new docs become searchable when the build is swapped in
+    request_reindex(doc_dir=str(doc_dir))
+
+@st.fragment(run_every=2)
+def index_status():
+    s = reindex_status()
+    if s["state"] == "indexing":
+        st.info(f"Indexing… {s['done']}/{s['total']} changed file(s)" if s["total"] else "Indexing…")
+    elif s["state"] == "queued":
+        st.info("Indexing queued…")
+    elif s["state"] == "error":
+        st.error(f"Indexing failed, still answering from the previous index: {s['error']}")
+    elif s["state"] == "ready":
+        st.caption(f"Index {s['version']} live")
+
+with st.sidebar:
+    index_status()
+
+# Shared graph; each browser session gets its own thread_id so the checkpointer keeps per-user memory
+if "config" not in st.session_state:
+    st.session_state.config = {"configurable": {"thread_id": f"tid-{os.urandom(8).hex()}"}}
     st.session_state.history = []  # store (role, content)
 
-graph, config, system_msg = st.session_state.graph_bundle
+graph, _, system_msg = shared_graph()
+config = st.session_state.config
+
+with st.sidebar.expander("Session memory"):
+    stats = get_checkpointer().thread_stats(config["configurable"]["thread_id"])
+    st.json(stats[0] if stats else {})
 
 # Chat input
 with st.form("qa"):
@@ -109,31 +131,37 @@ if submitted and question.strip():
 
     user_msg = build_user_message(question, img_path)
 
-    # Invoke the graph with memory (system message + user message)
-    with st.spinner("Thinking…"):
-        result = graph.invoke({"messages": [system_msg, user_msg]}, config)
+    # Stream the turn (system message + user message): tokens and tool events show up as they happen
+    st.markdown("### Assistant")
+    answer_box = st.empty()
+    status = st.status("Thinking…", expanded=False)
+    streamed, result = "", {"messages": []}
+    for ev in iter_turn(graph, {"messages": [system_msg, user_msg]}, config):
+        if ev["event"] == "token":
+            streamed += ev["text"]
+            answer_box.markdown(streamed + "▌")
+        elif ev["event"] == "tool_start":
+            status.update(label=f"Running {ev['name']}…")
+            status.write(f"▶ {ev['name']} started")
+        elif ev["event"] == "tool_end":
+            status.write(f"{'✔' if ev['ok'] else '✖'} {ev['name']} finished")
+        elif ev["event"] == "final":
+            result = {"messages": ev["messages"]}
+    status.update(label="Done", state="complete")
 
     # Display final assistant reply
-    final = result["messages"][-1]
+    final = result["messages"][-1] if result["messages"] else None
     if isinstance(final, AIMessage):
-        st.markdown("### Assistant")
-        st.write(final.content)
+        answer_box.markdown(final.content)
         st.session_state.history.append(("assistant", final.content))
 
-    # Try to pull annotated image/artifacts from ToolMessages
-    ann_path, data_url, dets = find_objdetect_artifacts(result["messages"])
-    if ann_path and os.path.exists(ann_path):
+    # Try to pull the annotated image from ToolMessages (handle -> PNG bytes on disk)
+    ann_bytes, dets = find_objdetect_artifacts(result["messages"])
+    if ann_bytes:
         st.markdown("### Annotated detection")
-        st.image(PILImage.open(ann_path), use_column_width=True)
+        st.image(ann_bytes, use_column_width=True)
         with st.expander("Detections (JSON)"):
             st.json(dets or [])
-    elif data_url:
-        try:
-            header, b64 = data_url.split(",", 1)
-            st.markdown("### Annotated detection")
-            st.image(io.BytesIO(bytearray(b64, "utf-8")), use_column_width=True)  # fallback approach
-        except Exception:
-            pass
 
 # Show conversation history (current session)
 if st.session_state.get("history"):
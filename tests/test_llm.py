@@ -0,0 +1,32 @@
+import asyncio, gc, os, weakref
+os.environ.setdefault("OPENAI_API_KEY", "test")  # app.config refuses to import without one
+
+from app import llm
+from app.tools.tavily_tool import tavily_search
+
+def _count_builds(monkeypatch) -> list:
+    built = []
+    build = llm._build
+    monkeypatch.setattr(llm, "_build", lambda *a, **kw: built.append(a[0]) or build(*a, **kw))
+    monkeypatch.setattr(llm, "_SYNC_MODELS", {})
+    monkeypatch.setattr(llm, "_ASYNC_MODELS", {})
+    return built
+
+async def _turn():
+    return llm.get_chat_model([tavily_search], "gpt-test"), weakref.ref(asyncio.get_running_loop())
+
+def test_turns_on_the_shared_loop_reuse_one_model(monkeypatch):
+    built = _count_builds(monkeypatch)
+    models = [llm.run(_turn())[0] for _ in range(5)]
+    assert len(built) == 1
+    assert all(m is models[0] for m in models)
+    assert len(llm._ASYNC_MODELS) == 1
+
+def test_asyncio_run_turns_leave_nothing_behind(monkeypatch):
+    built = _count_builds(monkeypatch)
+    turns = [asyncio.run(_turn()) for _ in range(5)]
+    gc.collect()
+    assert len(built) == 1
+    assert all(m is turns[0][0] for m, _ in turns)
+    assert llm._ASYNC_MODELS == {}
+    assert not any(loop() for _, loop in turns)  # no model or pool holds a finished loop